@@ -0,0 +1,4 @@
+import time
+
+# Začátek importu balíčku; z něj se počítá metrika app_startup_seconds.
+IMPORT_STARTED = time.perf_counter()
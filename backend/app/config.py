@@ -8,6 +8,14 @@ from pathlib import Path
 class Settings:
     database_url: str = os.getenv("DATABASE_URL", "sqlite:///./mikulash.db")
     ruian_source_url: str | None = os.getenv("RUIAN_SOURCE_URL") or None
+    ruian_obce_path: str | None = os.getenv("RUIAN_OBCE_PATH") or None
+    http_max_connections: int = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+    http_max_concurrency: int = int(os.getenv("HTTP_MAX_CONCURRENCY", "8"))
+    batch_workers: int = int(os.getenv("BATCH_WORKERS", str(os.cpu_count() or 1)))
+    batch_concurrency: int = int(os.getenv("BATCH_CONCURRENCY", "4"))
+    batch_write_size: int = int(os.getenv("BATCH_WRITE_SIZE", "10"))
+    search_cache_size: int = int(os.getenv("SEARCH_CACHE_SIZE", "256"))
+    export_cache_dir: str = os.getenv("EXPORT_CACHE_DIR", "./export_cache")
     osrm_base_url: str | None = os.getenv("OSRM_BASE_URL") or None
     gh_base_url: str | None = os.getenv("GH_BASE_URL") or None
     gh_key: str | None = os.getenv("GH_KEY") or None
@@ -1,15 +1,15 @@
 from __future__ import annotations
 
+import hashlib
 import sqlite3
 from contextlib import contextmanager
 from pathlib import Path
-from typing import Iterable
+from typing import Iterable, Iterator, Sequence
 
 from .config import get_settings
+from .metrics import timed
 from .models import MunicipalityCache, ObjectRecord
 
-settings = get_settings()
-
 
 def _resolve_path(url: str) -> Path:
     if not url.startswith("sqlite:///"):
@@ -55,35 +55,144 @@ def _ensure_schema(conn: sqlite3.Connection) -> None:
     conn.commit()
 
 
+# cesta -> (zařízení, inode) souboru, pro který už schéma proběhlo
+_schema_ready: dict[Path, tuple[int, int]] = {}
+
+
+def _file_id(path: Path) -> tuple[int, int] | None:
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_dev, stat.st_ino
+
+
 @contextmanager
 def get_connection():
-    db_path = _resolve_path(settings.database_url)
-    db_path.parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(db_path)
+    db_path = _resolve_path(get_settings().database_url)
+    # smazaný nebo vyměněný soubor (rotace, obnova zálohy) dostane schéma znovu
+    file_id = _file_id(db_path)
+    ready = file_id is not None and _schema_ready.get(db_path) == file_id
+    if not ready:
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(db_path, check_same_thread=False)
     conn.row_factory = sqlite3.Row
-    _ensure_schema(conn)
+    if not ready:
+        _ensure_schema(conn)
+        _schema_ready[db_path] = _file_id(db_path)
     try:
         yield conn
     finally:
         conn.close()
 
 
+def init_db() -> None:
+    """Vytvoří schéma a indexy předem, aby první požadavek nečekal na DDL."""
+    with get_connection():
+        pass
+
+
+OBJECT_FIELDS = (
+    "id",
+    "kod_obce",
+    "kod_stavebni_objekt",
+    "typ",
+    "byty_odhad",
+    "letaky",
+    "lon",
+    "lat",
+    "ulice",
+    "cp_ce",
+    "cast_obce",
+    "psc",
+    "nejiste",
+)
+
+
+def query_objects(
+    conn: sqlite3.Connection,
+    kod_obce: str,
+    fields: Sequence[str] | None = None,
+    typ: str | None = None,
+    has_coordinates: bool | None = None,
+    cast_obce: str | None = None,
+    after_id: int | None = None,
+    limit: int | None = None,
+    batch_size: int = 1000,
+) -> Iterator[sqlite3.Row]:
+    """Postupně vrací řádky objektů obce s projekcí sloupců a filtry v SQL.
+
+    Stránkuje se podle `id` (keyset): další stránka začíná `after_id`
+    posledního vráceného řádku. Sloupec `id` je ve výsledku vždy.
+    """
+    columns = list(fields or OBJECT_FIELDS)
+    unknown = [column for column in columns if column not in OBJECT_FIELDS]
+    if unknown:
+        raise ValueError(f"Neznámé pole: {', '.join(unknown)}")
+    if "id" not in columns:
+        columns.insert(0, "id")
+
+    sql = [f"SELECT {', '.join(columns)} FROM objects WHERE kod_obce = ?"]
+    params: list = [kod_obce]
+    if typ is not None:
+        sql.append("AND typ = ?")
+        params.append(typ)
+    if has_coordinates is True:
+        sql.append("AND lon IS NOT NULL AND lat IS NOT NULL")
+    elif has_coordinates is False:
+        sql.append("AND (lon IS NULL OR lat IS NULL)")
+    if cast_obce is not None:
+        sql.append("AND cast_obce = ?")
+        params.append(cast_obce)
+    if after_id is not None:
+        sql.append("AND id > ?")
+        params.append(after_id)
+    sql.append("ORDER BY id")
+    if limit is not None:
+        sql.append("LIMIT ?")
+        params.append(limit)
+
+    cur = conn.execute(" ".join(sql), params)
+    while True:
+        rows = cur.fetchmany(batch_size)
+        if not rows:
+            return
+        yield from rows
+
+
+def iter_objects(
+    conn: sqlite3.Connection,
+    kod_obce: str,
+    typ: str | None = None,
+    has_coordinates: bool | None = None,
+    cast_obce: str | None = None,
+) -> Iterator[ObjectRecord]:
+    rows = query_objects(conn, kod_obce, typ=typ, has_coordinates=has_coordinates, cast_obce=cast_obce)
+    for row in rows:
+        yield ObjectRecord.from_row(row)
+
+
+@timed("database.load_objects")
 def load_objects(conn: sqlite3.Connection, kod_obce: str) -> list[ObjectRecord]:
-    cur = conn.execute("SELECT * FROM objects WHERE kod_obce = ?", (kod_obce,))
-    rows = cur.fetchall()
-    return [ObjectRecord.from_row(row) for row in rows]
+    return list(iter_objects(conn, kod_obce))
 
 
-def replace_objects(conn: sqlite3.Connection, kod_obce: str, objects: Iterable[ObjectRecord]) -> None:
+@timed("database.replace_objects")
+def replace_objects(
+    conn: sqlite3.Connection,
+    kod_obce: str,
+    objects: Iterable[ObjectRecord],
+    commit: bool = True,
+) -> None:
     conn.execute("DELETE FROM objects WHERE kod_obce = ?", (kod_obce,))
-    for obj in objects:
-        conn.execute(
-            """
-            INSERT INTO objects (
-                kod_obce, kod_stavebni_objekt, typ, byty_odhad, letaky, lon, lat,
-                ulice, cp_ce, cast_obce, psc, nejiste
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
+    conn.executemany(
+        """
+        INSERT INTO objects (
+            kod_obce, kod_stavebni_objekt, typ, byty_odhad, letaky, lon, lat,
+            ulice, cp_ce, cast_obce, psc, nejiste
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        (
             (
                 kod_obce,
                 obj.kod_stavebni_objekt,
@@ -97,9 +206,27 @@ def replace_objects(conn: sqlite3.Connection, kod_obce: str, objects: Iterable[O
                 obj.cast_obce,
                 obj.psc,
                 obj.nejiste,
-            ),
-        )
-    conn.commit()
+            )
+            for obj in objects
+        ),
+    )
+    if commit:
+        conn.commit()
+
+
+def data_version(conn: sqlite3.Connection, kod_obce: str) -> str | None:
+    """Krátký otisk dat obce; mění se při každém přepsání objektů nebo cache.
+
+    Vrací None, pokud obec nemá uložené žádné objekty.
+    """
+    count, max_id = conn.execute(
+        "SELECT COUNT(*), MAX(id) FROM objects WHERE kod_obce = ?", (kod_obce,)
+    ).fetchone()
+    if not count:
+        return None
+    row = conn.execute("SELECT created_at FROM municipality_cache WHERE kod_obce = ?", (kod_obce,)).fetchone()
+    created_at = row[0] if row else ""
+    return hashlib.sha1(f"{created_at}|{count}|{max_id}".encode()).hexdigest()[:16]
 
 
 def get_cache(conn: sqlite3.Connection, kod_obce: str) -> MunicipalityCache | None:
@@ -110,7 +237,7 @@ def get_cache(conn: sqlite3.Connection, kod_obce: str) -> MunicipalityCache | No
     return MunicipalityCache.from_row(row)
 
 
-def upsert_cache(conn: sqlite3.Connection, cache: MunicipalityCache) -> None:
+def upsert_cache(conn: sqlite3.Connection, cache: MunicipalityCache, commit: bool = True) -> None:
     conn.execute(
         """
         INSERT INTO municipality_cache (kod_obce, name, created_at, raw_source)
@@ -122,4 +249,5 @@ def upsert_cache(conn: sqlite3.Connection, cache: MunicipalityCache) -> None:
         """,
         (cache.kod_obce, cache.name, cache.created_at_iso, cache.raw_source),
     )
-    conn.commit()
+    if commit:
+        conn.commit()
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import asyncio
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import TYPE_CHECKING, AsyncIterator
+
+from .config import get_settings
+
+if TYPE_CHECKING:
+    import httpx
+
+_client: httpx.AsyncClient | None = None
+_client_loop: asyncio.AbstractEventLoop | None = None
+_semaphore: asyncio.Semaphore | None = None
+_semaphore_loop: asyncio.AbstractEventLoop | None = None
+
+
+def _new_client() -> httpx.AsyncClient:
+    import httpx
+
+    settings = get_settings()
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_connections,
+        ),
+        follow_redirects=True,
+    )
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore, _semaphore_loop
+    loop = asyncio.get_running_loop()
+    if _semaphore is None or _semaphore_loop is not loop:
+        _semaphore = asyncio.Semaphore(get_settings().http_max_concurrency)
+        _semaphore_loop = loop
+    return _semaphore
+
+
+async def open_client() -> None:
+    """Otevře sdílený klient s poolem spojení pro event loop aplikace (z lifespan)."""
+    global _client, _client_loop
+    await close_client()
+    _client = _new_client()
+    _client_loop = asyncio.get_running_loop()
+
+
+@asynccontextmanager
+async def stream(method: str, url: str, timeout: float, **kwargs) -> AsyncIterator[httpx.Response]:
+    """Otevře streamovanou odpověď; počet souběžných požadavků je omezen semaforem.
+
+    Mimo lifespan aplikace (skripty, testy s vlastním event loopem) se použije
+    krátkodobý klient, který se po odpovědi zavře. Zrušení volající korutiny
+    spojení uzavře a vrátí je do poolu.
+    """
+    async with _get_semaphore(), AsyncExitStack() as stack:
+        client = _client if _client_loop is asyncio.get_running_loop() else None
+        if client is None:
+            client = await stack.enter_async_context(_new_client())
+        response = await stack.enter_async_context(client.stream(method, url, timeout=timeout, **kwargs))
+        response.raise_for_status()
+        yield response
+
+
+async def close_client() -> None:
+    global _client, _client_loop
+    if _client is not None:
+        await _client.aclose()
+    _client = _client_loop = None
@@ -1,21 +1,29 @@
 from __future__ import annotations
 
 import asyncio
+import json
+import logging
+import time
+from contextlib import asynccontextmanager
 from datetime import datetime
 from typing import List
 
-from fastapi import Depends, FastAPI, File, HTTPException, UploadFile
+from fastapi import Depends, FastAPI, File, HTTPException, Query, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, PlainTextResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
 
-from .config import get_settings
+from . import IMPORT_STARTED, http_client
 from .database import (
     get_connection,
     get_cache,
+    init_db,
+    iter_objects,
     load_objects,
+    query_objects,
     replace_objects,
     upsert_cache,
 )
+from .metrics import STARTUP_SECONDS, MetricsMiddleware, record_cache, render_metrics, timed
 from .models import MunicipalityCache
 from .ruian import (
     deserialize_records,
@@ -25,14 +33,30 @@ from .ruian import (
     search_municipality,
     serialize_records,
 )
-from .schemas import PlanRequest, RouteRequest, SearchRequest
-from .services.exporters import export_csv, export_geojson, export_gpx, export_kml
+from .schemas import BatchPlanRequest, PlanRequest, RouteRequest, SearchRequest
+from .services.batch import plan_batch, shutdown_process_pool
 from .services.planner import PlannerService
-from .services.routing import build_route
+from .services.search import get_municipality_index
 
-app = FastAPI(title="Mikuláš Planner")
-settings = get_settings()
+logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    init_db()
+    get_municipality_index()
+    await http_client.open_client()
+    ready = time.perf_counter() - IMPORT_STARTED
+    STARTUP_SECONDS.set(ready, phase="ready")
+    logger.info("Backend ready in %.3f s", ready)
+    yield
+    await http_client.close_client()
+    shutdown_process_pool()
+
+
+app = FastAPI(title="Mikuláš Planner", lifespan=lifespan)
+
+app.add_middleware(MetricsMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -52,6 +76,11 @@ def status() -> dict:
     return {"status": "ok", "timestamp": datetime.utcnow().isoformat()}
 
 
+@app.get("/metrics")
+def metrics() -> PlainTextResponse:
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 @app.post("/api/search-municipality")
 async def search(req: SearchRequest) -> List[dict[str, str]]:
     return await search_municipality(req.q)
@@ -59,6 +88,7 @@ async def search(req: SearchRequest) -> List[dict[str, str]]:
 
 async def _ensure_objects(conn, kod_obce: str):
     objects = load_objects(conn, kod_obce)
+    record_cache("objects", bool(objects))
     if objects:
         return objects
 
@@ -78,54 +108,160 @@ async def _ensure_objects(conn, kod_obce: str):
 async def plan(req: PlanRequest, conn=Depends(get_db_conn)):
     objects = await _ensure_objects(conn, req.kod_obce)
     geojson = PlannerService.to_geojson(objects)
-    return JSONResponse(content=geojson)
+    with timed("serialization.plan"):
+        return JSONResponse(content=geojson)
+
+
+def _features_chunk(objects) -> str:
+    return ",".join(json.dumps(PlannerService.to_feature(obj), ensure_ascii=False) for obj in objects)
+
+
+@app.post("/api/plan/batch")
+async def plan_batch_endpoint(req: BatchPlanRequest):
+    async def ndjson():
+        with get_connection() as conn:
+            async for result, _ in plan_batch(conn, req.kod_obce):
+                yield json.dumps(result, ensure_ascii=False) + "\n"
+
+    async def geojson():
+        yield '{"type": "FeatureCollection", "features": ['
+        first = True
+        with get_connection() as conn:
+            async for _, objects in plan_batch(conn, req.kod_obce):
+                if not objects:
+                    continue
+                chunk = await asyncio.to_thread(_features_chunk, objects)
+                yield ("" if first else ",") + chunk
+                first = False
+        yield "]}"
+
+    if req.format == "geojson":
+        return StreamingResponse(geojson(), media_type="application/geo+json")
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
 
 
 @app.post("/api/route")
 async def route(req: RouteRequest):
+    from .services.routing import build_route
+
     if not req.features:
         raise HTTPException(status_code=400, detail="Chybí body")
     points = [
-        {"id": feature.id, "lon": feature.lon, "lat": feature.lat}
+        {
+            "id": feature.id,
+            "lon": feature.lon,
+            "lat": feature.lat,
+            "letaky": feature.letaky,
+            "typ": feature.typ,
+            "kod_stavebni_objekt": feature.kod_stavebni_objekt,
+        }
         for feature in req.features
     ]
+    tours = {
+        "max_letaky": req.max_letaky,
+        "max_shift_s": req.max_shift_s,
+        "depot": req.depot.model_dump() if req.depot else None,
+        "compact": req.compact,
+        "improve_passes": req.improve_passes,
+        "zoom": req.zoom,
+        "geometry_format": req.geometry_format,
+    }
     try:
-        result = await asyncio.to_thread(build_route, points, req.engine, req.profile)
+        result = await asyncio.to_thread(build_route, points, req.engine, req.profile, **tours)
     except Exception as exc:
-        if req.engine != "none":
-            result = await asyncio.to_thread(build_route, points, "none", req.profile)
+        if req.engine not in ("none", "hilbert"):
+            result = await asyncio.to_thread(build_route, points, "none", req.profile, **tours)
             return JSONResponse(status_code=503, content={"engine_error": str(exc), "fallback": result})
         raise HTTPException(status_code=503, detail=str(exc))
     return JSONResponse(content=result)
 
 
+@app.get("/api/objects")
+def objects_endpoint(
+    kod_obce: str,
+    fields: str | None = None,
+    typ: str | None = None,
+    has_coordinates: bool | None = None,
+    cast_obce: str | None = None,
+    after: int | None = None,
+    limit: int = Query(default=1000, ge=1, le=10000),
+    conn=Depends(get_db_conn),
+):
+    columns = [field.strip() for field in fields.split(",") if field.strip()] if fields else None
+    try:
+        rows = query_objects(
+            conn,
+            kod_obce,
+            fields=columns,
+            typ=typ,
+            has_coordinates=has_coordinates,
+            cast_obce=cast_obce,
+            after_id=after,
+            limit=limit + 1,
+        )
+        items = [dict(row) for row in rows]
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    next_after = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_after = items[-1]["id"]
+    return {"items": items, "next_after": next_after}
+
+
 @app.get("/api/export.csv")
-def export_csv_endpoint(kod_obce: str, conn=Depends(get_db_conn)):
-    objects = load_objects(conn, kod_obce)
+def export_csv_endpoint(
+    kod_obce: str, typ: str | None = None, cast_obce: str | None = None, conn=Depends(get_db_conn)
+):
+    from .services.exporters import export_csv
+
+    objects = iter_objects(conn, kod_obce, typ=typ, cast_obce=cast_obce)
     content = export_csv(objects)
     return PlainTextResponse(content, media_type="text/csv; charset=utf-8")
 
 
 @app.get("/api/export.geojson")
-def export_geojson_endpoint(kod_obce: str, conn=Depends(get_db_conn)):
-    objects = load_objects(conn, kod_obce)
+def export_geojson_endpoint(
+    kod_obce: str, typ: str | None = None, cast_obce: str | None = None, conn=Depends(get_db_conn)
+):
+    from .services.exporters import export_geojson
+
+    objects = iter_objects(conn, kod_obce, typ=typ, cast_obce=cast_obce)
     return JSONResponse(export_geojson(objects))
 
 
 @app.get("/api/export.kml")
-def export_kml_endpoint(kod_obce: str, conn=Depends(get_db_conn)):
-    objects = load_objects(conn, kod_obce)
+def export_kml_endpoint(
+    kod_obce: str, typ: str | None = None, cast_obce: str | None = None, conn=Depends(get_db_conn)
+):
+    from .services.exporters import export_kml
+
+    objects = iter_objects(conn, kod_obce, typ=typ, cast_obce=cast_obce)
     content = export_kml(objects)
     return PlainTextResponse(content, media_type="application/vnd.google-earth.kml+xml")
 
 
 @app.get("/api/export.gpx")
-def export_gpx_endpoint(kod_obce: str, conn=Depends(get_db_conn)):
-    objects = load_objects(conn, kod_obce)
+def export_gpx_endpoint(
+    kod_obce: str, typ: str | None = None, cast_obce: str | None = None, conn=Depends(get_db_conn)
+):
+    from .services.exporters import export_gpx
+
+    objects = iter_objects(conn, kod_obce, typ=typ, has_coordinates=True, cast_obce=cast_obce)
     content = export_gpx(objects)
     return PlainTextResponse(content, media_type="application/gpx+xml")
 
 
+@app.get("/api/export.zip")
+def export_bundle_endpoint(kod_obce: str, conn=Depends(get_db_conn)):
+    from .services.bundle import get_bundle
+
+    path = get_bundle(conn, kod_obce)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Obec nemá připravený plán")
+    return FileResponse(path, media_type="application/zip", filename=f"plan-{kod_obce}.zip")
+
+
 @app.post("/api/ruian-upload")
 async def ruian_upload(kod_obce: str, file: UploadFile = File(...), conn=Depends(get_db_conn)):
     data = await file.read()
@@ -146,3 +282,6 @@ def cache_info(kod_obce: str, conn=Depends(get_db_conn)):
         raise HTTPException(status_code=404, detail="Cache nenalezena")
     records = deserialize_records(cache_entry.raw_source)
     return {"count": len(records), "created_at": cache_entry.created_at_iso}
+
+
+STARTUP_SECONDS.set(time.perf_counter() - IMPORT_STARTED, phase="import")
@@ -4,17 +4,18 @@ import csv
 import io
 import json
 import logging
-import urllib.error
-import urllib.request
-from collections import defaultdict
+import urllib.parse
+from collections import OrderedDict, defaultdict
 from dataclasses import dataclass
 from typing import Iterable, List
 
 from .config import get_settings
+from .metrics import EXTERNAL_ERRORS, record_cache, timed
+from .services.search import fold, get_municipality_index
 
 logger = logging.getLogger(__name__)
 
-settings = get_settings()
+_search_cache: "OrderedDict[str, list[dict[str, str]]]" = OrderedDict()
 
 
 @dataclass
@@ -31,43 +32,86 @@ class RuianRecord:
 
 
 async def search_municipality(query: str) -> List[dict[str, str]]:
+    """Vyhledá obec v lokálním číselníku a v RÚIAN.
+
+    Lokální číselník obsahuje jen část obcí, proto se RÚIAN ptá vždy, když je
+    nastaven. Přesné a prefixové lokální shody jdou na začátek, přibližné
+    (fuzzy) až za výsledky z RÚIAN.
+    """
     q = query.strip()
     if not q:
         return []
 
-    if settings.ruian_source_url:
-        url = f"{settings.ruian_source_url.rstrip('/')}/search?municipality={urllib.parse.quote(q)}"
-        try:
-            with urllib.request.urlopen(url, timeout=10) as response:
-                payload = json.loads(response.read().decode("utf-8"))
-                return [
-                    {"name": item.get("name", ""), "kod_obce": str(item.get("kod_obce"))}
-                    for item in payload.get("results", [])
-                    if item.get("kod_obce")
-                ]
-        except (urllib.error.URLError, ValueError) as exc:  # pragma: no cover - network fallback
-            logger.warning("RUIAN search failed: %s", exc)
-
-    samples = [
-        {"name": "Jihlava", "kod_obce": "586846"},
-        {"name": "Brno", "kod_obce": "582786"},
-        {"name": "Praha", "kod_obce": "554782"},
+    index = get_municipality_index()
+    direct = index.search(q, fuzzy=False)
+    approximate = [] if direct else index.search(q)
+    remote = await _search_remote(q)
+    if remote is None:
+        return direct or approximate
+    if direct:
+        return _merge_results(direct, remote)
+    return _merge_results(remote, approximate)
+
+
+async def _search_remote(q: str) -> List[dict[str, str]] | None:
+    """Výsledky hledání z RÚIAN (s LRU cache); None bez zdroje nebo při chybě."""
+    settings = get_settings()
+    if not settings.ruian_source_url:
+        return None
+
+    key = fold(q)
+    record_cache("ruian_search", key in _search_cache)
+    if key in _search_cache:
+        _search_cache.move_to_end(key)
+        return _search_cache[key]
+
+    import httpx
+
+    from . import http_client
+
+    url = f"{settings.ruian_source_url.rstrip('/')}/search?municipality={urllib.parse.quote(q)}"
+    try:
+        with timed("ruian.search"):
+            async with http_client.stream("GET", url, timeout=10) as response:
+                payload = json.loads(await response.aread())
+    except (httpx.HTTPError, ValueError) as exc:  # pragma: no cover - network fallback
+        EXTERNAL_ERRORS.inc(service="ruian")
+        logger.warning("RUIAN search failed: %s", exc)
+        return None
+
+    results = [
+        {"name": item.get("name", ""), "kod_obce": str(item.get("kod_obce"))}
+        for item in payload.get("results", [])
+        if item.get("kod_obce")
     ]
-    q_lower = q.lower()
-    return [item for item in samples if q_lower in item["name"].lower()]
+    _search_cache[key] = results
+    if len(_search_cache) > settings.search_cache_size:
+        _search_cache.popitem(last=False)
+    return results
+
+
+def _merge_results(first: list[dict[str, str]], second: list[dict[str, str]]) -> list[dict[str, str]]:
+    seen = {item["kod_obce"] for item in first}
+    return first + [item for item in second if item["kod_obce"] not in seen]
 
 
 async def download_ruian_data(kod_obce: str) -> list[dict[str, str]]:
+    settings = get_settings()
     if settings.ruian_source_url:
+        import httpx
+
+        from . import http_client
+
         url = f"{settings.ruian_source_url.rstrip('/')}/municipality/{kod_obce}"
         try:
-            with urllib.request.urlopen(url, timeout=20) as response:
-                content_type = response.headers.get("content-type", "")
-                text = response.read().decode("utf-8")
-                if "json" in content_type:
-                    return json.loads(text)
-                return list(parse_csv(text.splitlines()))
-        except (urllib.error.URLError, ValueError) as exc:  # pragma: no cover
+            with timed("ruian.download"):
+                async with http_client.stream("GET", url, timeout=20) as response:
+                    if "json" in response.headers.get("content-type", ""):
+                        return json.loads(await response.aread())
+                    lines = [line async for line in response.aiter_lines()]
+                    return list(parse_csv(lines))
+        except (httpx.HTTPError, ValueError) as exc:  # pragma: no cover
+            EXTERNAL_ERRORS.inc(service="ruian")
             logger.warning("Failed to download RUIAN data: %s", exc)
     return list(load_sample_data())
 
@@ -79,7 +123,7 @@ def parse_csv(lines: Iterable[str]) -> Iterable[dict[str, str]]:
 
 
 def load_sample_data() -> Iterable[dict[str, str]]:
-    sample_path = settings.project_root / "backend" / "data" / "sample_ruian.csv"
+    sample_path = get_settings().project_root / "backend" / "data" / "sample_ruian.csv"
     with open(sample_path, "r", encoding="utf-8") as fh:
         yield from parse_csv(fh)
 
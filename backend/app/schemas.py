@@ -1,5 +1,5 @@
 from typing import Any, List
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 
 
 class MunicipalityCandidate(BaseModel):
@@ -16,6 +16,11 @@ class PlanRequest(BaseModel):
     routing: str | None = Field(default="none", pattern="^(osrm|graphhopper|none)$")
 
 
+class BatchPlanRequest(BaseModel):
+    kod_obce: List[str] = Field(min_length=1)
+    format: str = Field(default="ndjson", pattern="^(ndjson|geojson)$")
+
+
 class FeatureGeometry(BaseModel):
     type: str
     coordinates: List[float]
@@ -45,16 +50,38 @@ class PlanResponse(BaseModel):
     features: List[Feature]
 
 
+class RoutePoint(BaseModel):
+    lon: float
+    lat: float
+
+
 class RouteFeature(BaseModel):
     id: str
     lon: float
     lat: float
+    letaky: int = Field(default=1, ge=0)
+    typ: str | None = None
+    kod_stavebni_objekt: str | None = None
 
 
 class RouteRequest(BaseModel):
     features: List[RouteFeature]
     profile: str = Field(default="foot", pattern="^(foot|car)$")
-    engine: str = Field(default="none", pattern="^(osrm|graphhopper|none)$")
+    engine: str = Field(default="none", pattern="^(osrm|graphhopper|hilbert|none)$")
+    improve_passes: int = Field(default=0, ge=0, le=10)
+    max_letaky: int | None = Field(default=None, ge=1)
+    max_shift_s: float | None = Field(default=None, gt=0)
+    depot: RoutePoint | None = None
+    compact: bool = True
+    zoom: int | None = Field(default=None, ge=0, le=22)
+    geometry_format: str = Field(default="geojson", pattern="^(geojson|polyline)$")
+
+    @model_validator(mode="after")
+    def _tours_use_local_engine(self) -> "RouteRequest":
+        # okruhy počítá vždy lokální nearest-neighbour, jiný engine by se tiše ignoroval
+        if (self.max_letaky is not None or self.max_shift_s is not None) and self.engine != "none":
+            raise ValueError("Okruhy (max_letaky, max_shift_s) podporují jen engine 'none'")
+        return self
 
 
 class RouteResponse(BaseModel):
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import sqlite3
+from datetime import datetime
+from typing import TYPE_CHECKING, AsyncIterator, Iterable
+
+from ..config import get_settings
+from ..database import load_objects, replace_objects, upsert_cache
+from ..metrics import record_cache, timed
+from ..models import MunicipalityCache, ObjectRecord
+from ..ruian import RuianRecord, download_ruian_data, records_from_dicts, serialize_records
+from .planner import PlannerService
+
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+_pool: ProcessPoolExecutor | None = None
+
+
+def get_process_pool() -> ProcessPoolExecutor | None:
+    """Pool procesů pro CPU náročnou klasifikaci; při BATCH_WORKERS=0 se nepoužije."""
+    global _pool
+    workers = get_settings().batch_workers
+    if workers <= 0:
+        return None
+    if _pool is None:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        # fork z běžícího serveru by zdědil zamčené zámky (metriky, logging) z jiných vláken
+        _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def shutdown_process_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+    _pool = None
+
+
+def _result(kod_obce: str, source: str, objects: list[ObjectRecord]) -> dict:
+    return {
+        "kod_obce": kod_obce,
+        "status": "ok",
+        "source": source,
+        "objects": len(objects),
+        "letaky": sum(obj.letaky for obj in objects),
+    }
+
+
+def _write_batch(
+    conn: sqlite3.Connection,
+    batch: list[tuple[str, list[RuianRecord], list[ObjectRecord]]],
+) -> None:
+    try:
+        for kod_obce, records, objects in batch:
+            replace_objects(conn, kod_obce, objects, commit=False)
+            cache_entry = MunicipalityCache(kod_obce=kod_obce, name=kod_obce, created_at=datetime.utcnow())
+            cache_entry.raw_source = serialize_records(records)
+            upsert_cache(conn, cache_entry, commit=False)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+async def plan_batch(
+    conn: sqlite3.Connection, kod_obce_list: Iterable[str]
+) -> AsyncIterator[tuple[dict, list[ObjectRecord]]]:
+    """Připraví plány pro více obcí najednou a průběžně vrací výsledky.
+
+    Obce již uložené v databázi se vrátí hned, ostatní se stahují paralelně
+    (BATCH_CONCURRENCY), klasifikují v poolu procesů (BATCH_WORKERS) a
+    zapisují po BATCH_WRITE_SIZE obcích v jedné transakci. Čtení i zápisy do
+    SQLite běží mimo event loop; selhání zápisu se vrátí jako chybové řádky
+    pro dotčené obce.
+    """
+    settings = get_settings()
+    loop = asyncio.get_running_loop()
+    pool = get_process_pool()
+    semaphore = asyncio.Semaphore(max(settings.batch_concurrency, 1))
+
+    async def prepare(kod_obce: str):
+        try:
+            # semafor omezuje jen stahování, klasifikaci řídí fronta poolu
+            async with semaphore:
+                raw_records = await download_ruian_data(kod_obce)
+            records = records_from_dicts(raw_records)
+            if pool is not None:
+                # měření z dekorátoru zůstane v podprocesu, proto se měří i tady
+                with timed("planner.classify"):
+                    objects = await loop.run_in_executor(pool, PlannerService.classify, records, kod_obce)
+            else:
+                objects = await asyncio.to_thread(PlannerService.classify, records, kod_obce)
+        except Exception as exc:
+            logger.warning("Batch plan for %s failed: %s", kod_obce, exc)
+            return kod_obce, None, exc
+        return kod_obce, records, objects
+
+    async def flush(batch: list[tuple[str, list[RuianRecord], list[ObjectRecord]]]):
+        try:
+            await asyncio.to_thread(_write_batch, conn, batch)
+        except Exception as exc:
+            logger.warning("Batch write for %s failed: %s", [kod for kod, _, _ in batch], exc)
+            return [({"kod_obce": kod, "status": "error", "detail": str(exc)}, []) for kod, _, _ in batch]
+        return [(_result(kod, "ruian", objects), objects) for kod, _, objects in batch]
+
+    missing: list[str] = []
+    for kod_obce in dict.fromkeys(kod_obce_list):
+        objects = await asyncio.to_thread(load_objects, conn, kod_obce)
+        record_cache("objects", bool(objects))
+        if objects:
+            yield _result(kod_obce, "cache", objects), objects
+        else:
+            missing.append(kod_obce)
+
+    tasks = [asyncio.create_task(prepare(kod_obce)) for kod_obce in missing]
+    pending: list[tuple[str, list[RuianRecord], list[ObjectRecord]]] = []
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            kod_obce, records, outcome = await next_done
+            if records is None:
+                yield {"kod_obce": kod_obce, "status": "error", "detail": str(outcome)}, []
+                continue
+            pending.append((kod_obce, records, outcome))
+            if len(pending) >= settings.batch_write_size:
+                for item in await flush(pending):
+                    yield item
+                pending = []
+        if pending:
+            for item in await flush(pending):
+                yield item
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import tempfile
+from pathlib import Path
+
+from ..config import get_settings
+from ..database import data_version, iter_objects
+from ..metrics import record_cache
+from .exporters import export_bundle
+
+
+def _bundle_key(kod_obce: str) -> str:
+    # kod_obce přichází z požadavku, do cesty proto jde jen jeho otisk
+    return hashlib.sha1(kod_obce.encode("utf-8")).hexdigest()[:16]
+
+
+def bundle_path(kod_obce: str, version: str) -> Path:
+    cache_dir = Path(get_settings().export_cache_dir).resolve()
+    path = (cache_dir / f"{_bundle_key(kod_obce)}-{version}.zip").resolve()
+    if path.parent != cache_dir:
+        raise ValueError("Neplatná cesta exportu")
+    return path
+
+
+def _remove_stale(kod_obce: str, current: Path) -> None:
+    """Smaže starší verze balíčku; novější (např. z paralelního požadavku) nechá být."""
+    try:
+        current_mtime = current.stat().st_mtime
+    except FileNotFoundError:
+        return
+    for stale in current.parent.glob(f"{_bundle_key(kod_obce)}-*.zip"):
+        if stale == current:
+            continue
+        try:
+            if stale.stat().st_mtime < current_mtime:
+                stale.unlink()
+        except FileNotFoundError:
+            continue
+
+
+def get_bundle(conn: sqlite3.Connection, kod_obce: str) -> Path | None:
+    """Vrátí cestu k zipu se všemi exporty obce, případně ho nejdřív vytvoří.
+
+    Soubor je klíčovaný verzí dat obce, takže se po novém importu vytvoří
+    znovu a starší verze se smažou. Vrací None, pokud obec nemá objekty.
+    """
+    version = data_version(conn, kod_obce)
+    if version is None:
+        return None
+    path = bundle_path(kod_obce, version)
+    if path.exists():
+        record_cache("export_bundle", True)
+        return path
+
+    record_cache("export_bundle", False)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            export_bundle(iter_objects(conn, kod_obce), tmp)
+        os.replace(tmp_name, path)
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
+
+    _remove_stale(kod_obce, path)
+    return path
@@ -2,77 +2,136 @@ from __future__ import annotations
 
 import csv
 import io
+import json
+import zipfile
+from typing import BinaryIO, Iterable
 from xml.etree.ElementTree import Element, SubElement, tostring
 
+from ..metrics import timed
 from ..models import ObjectRecord
 
+CSV_HEADER = [
+    "KodStavebniObjekt",
+    "Typ",
+    "BytyOdhad",
+    "Letaky",
+    "Lon",
+    "Lat",
+    "Ulice",
+    "Cislo",
+    "CastObce",
+    "PSC",
+    "Nejiste",
+]
 
-def export_csv(objects: list[ObjectRecord]) -> str:
+
+def _csv_row(obj: ObjectRecord) -> list:
+    return [
+        obj.kod_stavebni_objekt,
+        obj.typ,
+        obj.byty_odhad,
+        obj.letaky,
+        obj.lon,
+        obj.lat,
+        obj.ulice,
+        obj.cp_ce,
+        obj.cast_obce,
+        obj.psc,
+        obj.nejiste,
+    ]
+
+
+def _kml_document() -> tuple[Element, Element]:
+    kml = Element("kml", xmlns="http://www.opengis.net/kml/2.2")
+    return kml, SubElement(kml, "Document")
+
+
+def _kml_placemark(document: Element, obj: ObjectRecord) -> None:
+    placemark = SubElement(document, "Placemark")
+    SubElement(placemark, "name").text = f"{obj.typ} {obj.cp_ce or ''}"
+    description = SubElement(placemark, "description")
+    description.text = f"Letáky: {obj.letaky}, Byty: {obj.byty_odhad}"
+    if obj.lon is not None and obj.lat is not None:
+        point = SubElement(placemark, "Point")
+        SubElement(point, "coordinates").text = f"{obj.lon},{obj.lat},0"
+
+
+def _gpx_root() -> Element:
+    return Element(
+        "gpx",
+        version="1.1",
+        creator="Mikuláš Planner",
+        xmlns="http://www.topografix.com/GPX/1/1",
+    )
+
+
+def _gpx_waypoint(gpx: Element, obj: ObjectRecord) -> None:
+    if obj.lon is None or obj.lat is None:
+        return
+    wpt = SubElement(gpx, "wpt", lat=str(obj.lat), lon=str(obj.lon))
+    SubElement(wpt, "name").text = f"{obj.typ} {obj.cp_ce or ''}"
+    SubElement(wpt, "desc").text = f"Letáky: {obj.letaky}"
+
+
+@timed("exporters.csv")
+def export_csv(objects: Iterable[ObjectRecord]) -> str:
     buffer = io.StringIO()
     writer = csv.writer(buffer, delimiter=";")
-    writer.writerow([
-        "KodStavebniObjekt",
-        "Typ",
-        "BytyOdhad",
-        "Letaky",
-        "Lon",
-        "Lat",
-        "Ulice",
-        "Cislo",
-        "CastObce",
-        "PSC",
-        "Nejiste",
-    ])
+    writer.writerow(CSV_HEADER)
     for obj in objects:
-        writer.writerow(
-            [
-                obj.kod_stavebni_objekt,
-                obj.typ,
-                obj.byty_odhad,
-                obj.letaky,
-                obj.lon,
-                obj.lat,
-                obj.ulice,
-                obj.cp_ce,
-                obj.cast_obce,
-                obj.psc,
-                obj.nejiste,
-            ]
-        )
+        writer.writerow(_csv_row(obj))
     return buffer.getvalue()
 
 
-def export_geojson(objects: list[ObjectRecord]) -> dict:
+@timed("exporters.geojson")
+def export_geojson(objects: Iterable[ObjectRecord]) -> dict:
     from .planner import PlannerService
 
     return PlannerService.to_geojson(objects)
 
 
-def export_kml(objects: list[ObjectRecord]) -> str:
-    kml = Element("kml", xmlns="http://www.opengis.net/kml/2.2")
-    document = SubElement(kml, "Document")
+@timed("exporters.kml")
+def export_kml(objects: Iterable[ObjectRecord]) -> str:
+    kml, document = _kml_document()
     for obj in objects:
-        placemark = SubElement(document, "Placemark")
-        SubElement(placemark, "name").text = f"{obj.typ} {obj.cp_ce or ''}"
-        description = SubElement(placemark, "description")
-        description.text = f"Letáky: {obj.letaky}, Byty: {obj.byty_odhad}"
-        if obj.lon is not None and obj.lat is not None:
-            point = SubElement(placemark, "Point")
-            SubElement(point, "coordinates").text = f"{obj.lon},{obj.lat},0"
+        _kml_placemark(document, obj)
     return tostring(kml, encoding="utf-8").decode("utf-8")
 
 
-def export_gpx(objects: list[ObjectRecord]) -> str:
-    gpx = Element(
-        "gpx",
-        version="1.1",
-        creator="Mikuláš Planner",
-        xmlns="http://www.topografix.com/GPX/1/1",
-    )
+@timed("exporters.gpx")
+def export_gpx(objects: Iterable[ObjectRecord]) -> str:
+    gpx = _gpx_root()
     for obj in objects:
-        if obj.lon is None or obj.lat is None:
-            continue
-        wpt = SubElement(gpx, "wpt", lat=str(obj.lat), lon=str(obj.lon))
-        SubElement(wpt, "name").text = f"{obj.typ} {obj.cp_ce or ''}"
-        SubElement(wpt, "desc").text = f"Letáky: {obj.letaky}"
+        _gpx_waypoint(gpx, obj)
     return tostring(gpx, encoding="utf-8").decode("utf-8")
+
+
+@timed("exporters.bundle")
+def export_bundle(objects: Iterable[ObjectRecord], fileobj: BinaryIO, name: str = "plan") -> int:
+    """Zapíše CSV, GeoJSON, KML a GPX do jednoho zipu při jediném průchodu objekty.
+
+    Vrací počet exportovaných objektů.
+    """
+    from .planner import PlannerService
+
+    csv_buffer = io.StringIO()
+    csv_writer = csv.writer(csv_buffer, delimiter=";")
+    csv_writer.writerow(CSV_HEADER)
+    features = []
+    kml, document = _kml_document()
+    gpx = _gpx_root()
+    count = 0
+    for obj in objects:
+        csv_writer.writerow(_csv_row(obj))
+        features.append(PlannerService.to_feature(obj))
+        _kml_placemark(document, obj)
+        _gpx_waypoint(gpx, obj)
+        count += 1
+
+    with zipfile.ZipFile(fileobj, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr(f"{name}.csv", csv_buffer.getvalue())
+        geojson = {"type": "FeatureCollection", "features": features}
+        archive.writestr(f"{name}.geojson", json.dumps(geojson, ensure_ascii=False))
+        archive.writestr(f"{name}.kml", tostring(kml, encoding="utf-8"))
+        archive.writestr(f"{name}.gpx", tostring(gpx, encoding="utf-8"))
+    return count
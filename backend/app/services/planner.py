@@ -3,12 +3,14 @@ from __future__ import annotations
 from collections import defaultdict
 from typing import Iterable, List
 
+from ..metrics import timed
 from ..models import ObjectRecord
 from ..ruian import RuianRecord
 
 
 class PlannerService:
     @staticmethod
+    @timed("planner.classify")
     def classify(records: Iterable[RuianRecord], kod_obce: str) -> List[ObjectRecord]:
         grouped: dict[str, list[RuianRecord]] = defaultdict(list)
         for record in records:
@@ -60,30 +62,33 @@ class PlannerService:
         return byty
 
     @staticmethod
-    def to_geojson(objects: List[ObjectRecord]) -> dict:
-        features = []
-        for obj in objects:
-            geometry = {
-                "type": "Point",
-                "coordinates": [obj.lon, obj.lat] if obj.lon is not None and obj.lat is not None else None,
-            }
-            properties = {
-                "id_obj": obj.kod_stavebni_objekt,
-                "typ": obj.typ,
-                "byty_odhad": obj.byty_odhad,
-                "letaky": obj.letaky,
-                "ulice": obj.ulice,
-                "cp_ce": obj.cp_ce,
-                "cast_obce": obj.cast_obce,
-                "psc": obj.psc,
-                "doporuceni": PlannerService._recommendations(obj.typ),
-                "nejiste": bool(obj.nejiste),
-            }
-            if geometry["coordinates"] is None:
-                properties["warnings"] = ["Chybí souřadnice"]
-            features.append({"type": "Feature", "geometry": geometry, "properties": properties})
+    @timed("planner.to_geojson")
+    def to_geojson(objects: Iterable[ObjectRecord]) -> dict:
+        features = [PlannerService.to_feature(obj) for obj in objects]
         return {"type": "FeatureCollection", "features": features}
 
+    @staticmethod
+    def to_feature(obj: ObjectRecord) -> dict:
+        geometry = {
+            "type": "Point",
+            "coordinates": [obj.lon, obj.lat] if obj.lon is not None and obj.lat is not None else None,
+        }
+        properties = {
+            "id_obj": obj.kod_stavebni_objekt,
+            "typ": obj.typ,
+            "byty_odhad": obj.byty_odhad,
+            "letaky": obj.letaky,
+            "ulice": obj.ulice,
+            "cp_ce": obj.cp_ce,
+            "cast_obce": obj.cast_obce,
+            "psc": obj.psc,
+            "doporuceni": PlannerService._recommendations(obj.typ),
+            "nejiste": bool(obj.nejiste),
+        }
+        if geometry["coordinates"] is None:
+            properties["warnings"] = ["Chybí souřadnice"]
+        return {"type": "Feature", "geometry": geometry, "properties": properties}
+
     @staticmethod
     def _recommendations(typ: str) -> list[str]:
         if typ == "RD":
@@ -5,11 +5,16 @@ import math
 import urllib.error
 import urllib.parse
 import urllib.request
+from collections import defaultdict
 from typing import List
 
 from ..config import get_settings
+from ..metrics import EXTERNAL_ERRORS, timed
 
-settings = get_settings()
+WALKING_SPEED_M_S = 1.4
+# Obsluha zastávky: pevná část (dojít ke schránce / vchodu) + čas na každý leták.
+SERVICE_BASE_S = {"RD": 30.0, "BD": 60.0}
+SERVICE_PER_LEAFLET_S = {"RD": 5.0, "BD": 8.0}
 
 
 def haversine_distance(lon1: float, lat1: float, lon2: float, lat2: float) -> float:
@@ -24,6 +29,7 @@ def haversine_distance(lon1: float, lat1: float, lon2: float, lat2: float) -> fl
 
 
 def route_with_osrm(points: List[dict], profile: str) -> dict:
+    settings = get_settings()
     if not settings.osrm_base_url:
         raise RuntimeError("OSRM URL není nastaveno")
     coords = ";".join([f"{p['lon']},{p['lat']}" for p in points])
@@ -46,6 +52,7 @@ def route_with_osrm(points: List[dict], profile: str) -> dict:
 
 
 def route_with_graphhopper(points: List[dict], profile: str) -> dict:
+    settings = get_settings()
     if not settings.gh_base_url:
         raise RuntimeError("GraphHopper URL není nastaveno")
     url = f"{settings.gh_base_url.rstrip('/')}/route"
@@ -98,7 +105,7 @@ def greedy_route(points: List[dict]) -> dict:
     distance = 0.0
     for a, b in zip(order, order[1:]):
         distance += haversine_distance(a["lon"], a["lat"], b["lon"], b["lat"])
-    duration = distance / 1.4
+    duration = distance / WALKING_SPEED_M_S
     return {
         "type": "Feature",
         "geometry": {
@@ -113,9 +120,468 @@ def greedy_route(points: List[dict]) -> dict:
     }
 
 
-def build_route(points: List[dict], engine: str, profile: str) -> dict:
-    if engine == "osrm":
-        return route_with_osrm(points, profile)
-    if engine == "graphhopper":
-        return route_with_graphhopper(points, profile)
-    return greedy_route(points)
+def _hilbert_index(order: int, x: int, y: int) -> int:
+    d = 0
+    s = 1 << (order - 1)
+    while s:
+        rx = 1 if x & s else 0
+        ry = 1 if y & s else 0
+        d += s * s * ((3 * rx) ^ ry)
+        if ry == 0:
+            if rx == 1:
+                x = s - 1 - x
+                y = s - 1 - y
+            x, y = y, x
+        s >>= 1
+    return d
+
+
+def _two_opt_window(
+    order: list[int], xy: list[tuple[float, float]], window: int, passes: int
+) -> None:
+    """Omezené 2-opt zlepšení otevřené cesty: prohazuje jen úseky kratší než `window`."""
+
+    def dist(a: int, b: int) -> float:
+        return math.hypot(xy[a][0] - xy[b][0], xy[a][1] - xy[b][1])
+
+    n = len(order)
+    for _ in range(passes):
+        improved = False
+        for i in range(n - 2):
+            for j in range(i + 2, min(i + window, n - 1)):
+                a, b, c, d = order[i], order[i + 1], order[j], order[j + 1]
+                if dist(a, c) + dist(b, d) < dist(a, b) + dist(c, d) - 1e-9:
+                    order[i + 1 : j + 1] = reversed(order[i + 1 : j + 1])
+                    improved = True
+        if not improved:
+            break
+
+
+def hilbert_route(points: List[dict], improve_passes: int = 0, window: int = 16) -> dict:
+    """Okamžitá trasa: body seřazené podél Hilbertovy křivky, O(n log n).
+
+    Volitelně následuje `improve_passes` průchodů 2-opt omezených na okno
+    `window` bodů, takže i zlepšení zůstává lineární v počtu bodů.
+    """
+    if not points:
+        return greedy_route(points)
+    lat0 = math.radians(sum(p["lat"] for p in points) / len(points))
+    kx = 111_320.0 * math.cos(lat0)
+    ky = 110_540.0
+    xy = [(p["lon"] * kx, p["lat"] * ky) for p in points]
+    min_x = min(x for x, _ in xy)
+    min_y = min(y for _, y in xy)
+    span = max(max(x for x, _ in xy) - min_x, max(y for _, y in xy) - min_y, 1e-9)
+    order_bits = 16
+    scale = ((1 << order_bits) - 1) / span
+    keys = [
+        _hilbert_index(order_bits, int((x - min_x) * scale), int((y - min_y) * scale)) for x, y in xy
+    ]
+    order = sorted(range(len(points)), key=keys.__getitem__)
+    if improve_passes:
+        _two_opt_window(order, xy, window, improve_passes)
+
+    ordered = [points[i] for i in order]
+    distance = 0.0
+    for a, b in zip(ordered, ordered[1:]):
+        distance += haversine_distance(a["lon"], a["lat"], b["lon"], b["lat"])
+    return {
+        "type": "Feature",
+        "geometry": {
+            "type": "LineString",
+            "coordinates": [[p["lon"], p["lat"]] for p in ordered],
+        },
+        "properties": {
+            "distance_m": distance,
+            "duration_s": distance / WALKING_SPEED_M_S,
+            "order": [p["id"] for p in ordered],
+        },
+    }
+
+
+def service_time(point: dict) -> float:
+    typ = point.get("typ") if point.get("typ") in SERVICE_BASE_S else "RD"
+    return SERVICE_BASE_S[typ] + SERVICE_PER_LEAFLET_S[typ] * point.get("letaky", 1)
+
+
+class _NearestGrid:
+    """Mřížka nad body v lokálních metrech pro rychlé hledání nejbližšího souseda.
+
+    Body se po navštívení odebírají; dotaz prohledává prstence buněk kolem
+    výchozí buňky, dokud další prstenec nemůže obsahovat bližší bod.
+    """
+
+    def __init__(self, points: List[dict]):
+        lat0 = math.radians(sum(p["lat"] for p in points) / len(points))
+        self.kx = 111_320.0 * math.cos(lat0)
+        self.ky = 110_540.0
+        self.xy = [(p["lon"] * self.kx, p["lat"] * self.ky) for p in points]
+        xs = [x for x, _ in self.xy]
+        ys = [y for _, y in self.xy]
+        self.min_x, self.min_y = min(xs), min(ys)
+        width, height = max(xs) - self.min_x, max(ys) - self.min_y
+        # ~2 body na buňku; u bodů v řadě (nulová plocha) rozhoduje delší strana
+        n = len(points)
+        self.cell = max(math.sqrt(width * height / n), max(width, height) / n, 1.0) * 1.5
+        self.cols = int(width // self.cell) + 1
+        self.rows = int(height // self.cell) + 1
+        self.cells: dict[tuple[int, int], list[int]] = {}
+        for idx, (x, y) in enumerate(self.xy):
+            self.cells.setdefault(self._key(x, y), []).append(idx)
+        self.size = len(points)
+
+    def _key(self, x: float, y: float) -> tuple[int, int]:
+        return int((x - self.min_x) // self.cell), int((y - self.min_y) // self.cell)
+
+    def project(self, lon: float, lat: float) -> tuple[float, float]:
+        return lon * self.kx, lat * self.ky
+
+    def remove(self, idx: int) -> None:
+        key = self._key(*self.xy[idx])
+        bucket = self.cells[key]
+        bucket.remove(idx)
+        if not bucket:
+            del self.cells[key]
+        self.size -= 1
+
+    def nearest(self, x: float, y: float) -> int | None:
+        if not self.size:
+            return None
+        cx, cy = self._key(x, y)
+        max_ring = max(abs(cx), abs(cx - self.cols), abs(cy), abs(cy - self.rows)) + 1
+        best, best_d = None, math.inf
+        for ring in range(max_ring + 1):
+            if (2 * ring + 1) ** 2 > len(self.cells):
+                # prstenec by byl větší než zbývající obsazené buňky: projdi je přímo
+                return self._scan(x, y)
+            for key in self._ring(cx, cy, ring):
+                for idx in self.cells.get(key, ()):
+                    px, py = self.xy[idx]
+                    d = (px - x) ** 2 + (py - y) ** 2
+                    if d < best_d or (d == best_d and idx < best):
+                        best, best_d = idx, d
+            if best is not None and best_d <= (ring * self.cell) ** 2:
+                break
+        return best
+
+    def _scan(self, x: float, y: float) -> int | None:
+        best, best_d = None, math.inf
+        for bucket in self.cells.values():
+            for idx in bucket:
+                px, py = self.xy[idx]
+                d = (px - x) ** 2 + (py - y) ** 2
+                if d < best_d or (d == best_d and idx < best):
+                    best, best_d = idx, d
+        return best
+
+    @staticmethod
+    def _ring(cx: int, cy: int, ring: int):
+        if ring == 0:
+            yield cx, cy
+            return
+        for x in range(cx - ring, cx + ring + 1):
+            yield x, cy - ring
+            yield x, cy + ring
+        for y in range(cy - ring + 1, cy + ring):
+            yield cx - ring, y
+            yield cx + ring, y
+
+
+def plan_tours(
+    points: List[dict],
+    max_letaky: int | None = None,
+    max_shift_s: float | None = None,
+    depot: dict | None = None,
+) -> dict:
+    """Rozdělí roznos na okruhy podle kapacity letáků a délky směny.
+
+    Pořadí určuje hladový nejbližší soused nad mřížkou (_NearestGrid).
+    Doba okruhu = chůze + obsluha zastávek (service_time podle typu a
+    počtu letáků). Okruh se uzavře, když by další zastávka překročila
+    `max_letaky` nebo `max_shift_s`; letáky se doplní v `depot` (okruhy
+    tam začínají i končí), jinak na místě poslední zastávky. Zastávka,
+    která se nevejde ani do prázdného okruhu, dostane okruh sama.
+    """
+    if not points:
+        return {
+            "type": "Feature",
+            "geometry": {"type": "MultiLineString", "coordinates": []},
+            "properties": {
+                "distance_m": 0,
+                "duration_s": 0,
+                "service_s": 0,
+                "order": [],
+                "segments": [],
+                "refill_points": [],
+            },
+        }
+
+    grid = _NearestGrid(points)
+    depot_at = (depot["lon"], depot["lat"]) if depot is not None else None
+    position = depot_at or (points[0]["lon"], points[0]["lat"])
+    segments: list[dict] = []
+    segment: dict | None = None
+
+    def walk(a: tuple[float, float], b: tuple[float, float]) -> float:
+        return haversine_distance(a[0], a[1], b[0], b[1])
+
+    def close(segment: dict) -> None:
+        if depot_at is not None:
+            segment["distance_m"] += walk(position, depot_at)
+            segment["coordinates"].append(list(depot_at))
+        segment["walk_s"] = segment["distance_m"] / WALKING_SPEED_M_S
+        segment["duration_s"] = segment["walk_s"] + segment["service_s"]
+        segments.append(segment)
+
+    while grid.size:
+        idx = grid.nearest(*grid.project(*position))
+        point = points[idx]
+        here = (point["lon"], point["lat"])
+        step = walk(position, here)
+        service = service_time(point)
+        letaky = point.get("letaky", 1)
+
+        if segment is not None:
+            walked = segment["distance_m"] + step
+            elapsed = walked / WALKING_SPEED_M_S + segment["service_s"] + service
+            if depot_at is not None:
+                elapsed += walk(here, depot_at) / WALKING_SPEED_M_S
+            over_capacity = max_letaky is not None and segment["letaky"] + letaky > max_letaky
+            over_shift = max_shift_s is not None and elapsed > max_shift_s
+            if over_capacity or over_shift:
+                close(segment)
+                segment = None
+                if depot_at is not None:
+                    position = depot_at
+                    continue
+
+        if segment is None:
+            segment = {
+                "order": [],
+                "letaky": 0,
+                "distance_m": 0.0,
+                "service_s": 0.0,
+                "refill": {"lon": position[0], "lat": position[1]},
+                "coordinates": [list(position)] if depot_at is not None or segments else [],
+            }
+
+        grid.remove(idx)
+        segment["order"].append(point["id"])
+        segment["letaky"] += letaky
+        segment["distance_m"] += step
+        segment["service_s"] += service
+        segment["coordinates"].append(list(here))
+        position = here
+    close(segment)
+
+    return {
+        "type": "Feature",
+        "geometry": {
+            "type": "MultiLineString",
+            "coordinates": [segment.pop("coordinates") for segment in segments],
+        },
+        "properties": {
+            "distance_m": sum(s["distance_m"] for s in segments),
+            "duration_s": sum(s["duration_s"] for s in segments),
+            "service_s": sum(s["service_s"] for s in segments),
+            "order": [point_id for s in segments for point_id in s["order"]],
+            "segments": segments,
+            "refill_points": [[s["refill"]["lon"], s["refill"]["lat"]] for s in segments],
+        },
+    }
+
+
+def compact_stops(
+    points: List[dict], epsilon_m: float = 5.0
+) -> tuple[list[dict], dict[str, list[str]]]:
+    """Sloučí adresní body jedné budovy do jedné zastávky.
+
+    Klíčem je `kod_stavebni_objekt`. Bod bez něj se připojí k nejbližší
+    zastávce, jejíž první bod je nejvýše `epsilon_m` daleko (hledá se v
+    sousedních buňkách mřížky s hranou `epsilon_m`). Zastávka přebírá id a
+    polohu prvního bodu, letáky se sčítají. Vrací zastávky a mapu id
+    zastávky -> id původních bodů.
+    """
+    if not points:
+        return [], {}
+    kx = 111_320.0 * math.cos(math.radians(points[0]["lat"]))
+    ky = 110_540.0
+    stops: dict[tuple, dict] = {}
+    members: dict[str, list[str]] = {}
+    cells: dict[tuple[int, int], list[tuple[float, float, tuple]]] = defaultdict(list)
+    for point in points:
+        building = point.get("kod_stavebni_objekt")
+        if building:
+            key: tuple = ("so", building)
+        else:
+            x, y = point["lon"] * kx, point["lat"] * ky
+            cx, cy = int(x // epsilon_m), int(y // epsilon_m)
+            key = ("xy", point["id"])
+            best = epsilon_m
+            for dx in (-1, 0, 1):
+                for dy in (-1, 0, 1):
+                    for ax, ay, anchor in cells.get((cx + dx, cy + dy), ()):
+                        distance = math.hypot(x - ax, y - ay)
+                        if distance <= best:
+                            best, key = distance, anchor
+            if key == ("xy", point["id"]):
+                cells[(cx, cy)].append((x, y, key))
+        stop = stops.get(key)
+        if stop is None:
+            stops[key] = dict(point, letaky=point.get("letaky", 1))
+            members[point["id"]] = [point["id"]]
+            continue
+        stop["letaky"] += point.get("letaky", 1)
+        if point.get("typ") == "BD":
+            stop["typ"] = "BD"
+        members[stop["id"]].append(point["id"])
+    return list(stops.values()), members
+
+
+def expand_order(route: dict, members: dict[str, list[str]]) -> dict:
+    """Převede pořadí zastávek zpět na id původních bodů."""
+
+    def expand(order: list[str]) -> list[str]:
+        return [point_id for stop_id in order for point_id in members.get(stop_id, [stop_id])]
+
+    properties = route["properties"]
+    properties["stops"] = len(properties["order"])
+    properties["order"] = expand(properties["order"])
+    for segment in properties.get("segments", []):
+        segment["order"] = expand(segment["order"])
+    return route
+
+
+def zoom_tolerance_m(zoom: int, lat: float, pixels: float = 1.0) -> float:
+    """Velikost `pixels` pixelů v metrech pro dlaždice 256 px na dané úrovni přiblížení."""
+    return 156_543.03392 * math.cos(math.radians(lat)) / (2**zoom) * pixels
+
+
+def simplify_line(coordinates: List[List[float]], tolerance_m: float) -> List[List[float]]:
+    """Douglas–Peucker nad [lon, lat] v lokálních metrech; krajní body zůstávají."""
+    if len(coordinates) < 3 or tolerance_m <= 0:
+        return coordinates
+    kx = 111_320.0 * math.cos(math.radians(coordinates[0][1]))
+    ky = 110_540.0
+    xy = [(c[0] * kx, c[1] * ky) for c in coordinates]
+    keep = [False] * len(coordinates)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(coordinates) - 1)]
+    while stack:
+        first, last = stack.pop()
+        ax, ay = xy[first]
+        bx, by = xy[last]
+        dx, dy = bx - ax, by - ay
+        length_sq = dx * dx + dy * dy
+        worst, worst_d = None, tolerance_m * tolerance_m
+        for idx in range(first + 1, last):
+            px, py = xy[idx]
+            if length_sq:
+                t = max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / length_sq))
+                qx, qy = ax + t * dx, ay + t * dy
+            else:
+                qx, qy = ax, ay
+            d = (px - qx) ** 2 + (py - qy) ** 2
+            if d > worst_d:
+                worst, worst_d = idx, d
+        if worst is not None:
+            keep[worst] = True
+            stack.append((first, worst))
+            stack.append((worst, last))
+    return [c for c, kept in zip(coordinates, keep) if kept]
+
+
+def encode_polyline(coordinates: List[List[float]], precision: int = 5) -> str:
+    """Google encoded polyline (pořadí lat, lon) ze souřadnic [lon, lat]."""
+    factor = 10**precision
+    chunks: list[str] = []
+    prev_lat = prev_lon = 0
+    for lon, lat, *_ in coordinates:
+        lat_i, lon_i = round(lat * factor), round(lon * factor)
+        for delta in (lat_i - prev_lat, lon_i - prev_lon):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                chunks.append(chr((0x20 | (value & 0x1F)) + 63))
+                value >>= 5
+            chunks.append(chr(value + 63))
+        prev_lat, prev_lon = lat_i, lon_i
+    return "".join(chunks)
+
+
+def shape_geometry(route: dict, zoom: int | None = None, geometry_format: str = "geojson") -> dict:
+    """Zjednoduší geometrii trasy pro danou úroveň přiblížení a případně ji zakóduje.
+
+    Ve formátu `polyline` je `geometry` null a čáry jsou v `properties.polyline`
+    (řetězec pro LineString, seznam pro MultiLineString).
+    """
+    geometry = route.get("geometry") or {}
+    if geometry.get("type") == "LineString":
+        lines = [geometry["coordinates"]]
+    elif geometry.get("type") == "MultiLineString":
+        lines = geometry["coordinates"]
+    else:
+        return route
+    properties = route["properties"]
+    properties["geometry_points_before"] = sum(len(line) for line in lines)
+    if zoom is not None and any(lines):
+        lat = next(line[0][1] for line in lines if line)
+        tolerance = zoom_tolerance_m(zoom, lat)
+        lines = [simplify_line(line, tolerance) for line in lines]
+    properties["geometry_points_after"] = sum(len(line) for line in lines)
+
+    if geometry_format == "polyline":
+        encoded = [encode_polyline(line) for line in lines]
+        properties["polyline"] = encoded[0] if geometry["type"] == "LineString" else encoded
+        route["geometry"] = None
+    elif geometry["type"] == "LineString":
+        route["geometry"] = {"type": "LineString", "coordinates": lines[0]}
+    else:
+        route["geometry"] = {"type": "MultiLineString", "coordinates": lines}
+    return route
+
+
+def _route(
+    points: List[dict],
+    engine: str,
+    profile: str,
+    max_letaky: int | None,
+    max_shift_s: float | None,
+    depot: dict | None,
+    improve_passes: int,
+) -> dict:
+    if max_letaky is not None or max_shift_s is not None:
+        with timed("routing.tours"):
+            return plan_tours(points, max_letaky, max_shift_s, depot)
+    with timed(f"routing.{engine}"):
+        try:
+            if engine == "osrm":
+                return route_with_osrm(points, profile)
+            if engine == "graphhopper":
+                return route_with_graphhopper(points, profile)
+        except Exception:
+            EXTERNAL_ERRORS.inc(service=engine)
+            raise
+        if engine == "hilbert":
+            return hilbert_route(points, improve_passes)
+        return greedy_route(points)
+
+
+def build_route(
+    points: List[dict],
+    engine: str,
+    profile: str,
+    max_letaky: int | None = None,
+    max_shift_s: float | None = None,
+    depot: dict | None = None,
+    compact: bool = False,
+    improve_passes: int = 0,
+    zoom: int | None = None,
+    geometry_format: str = "geojson",
+) -> dict:
+    if compact:
+        stops, members = compact_stops(points)
+        route = _route(stops, engine, profile, max_letaky, max_shift_s, depot, improve_passes)
+        route = expand_order(route, members)
+    else:
+        route = _route(points, engine, profile, max_letaky, max_shift_s, depot, improve_passes)
+    return shape_geometry(route, zoom, geometry_format)
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import csv
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, List
+
+from ..config import get_settings
+
+
+def fold(text: str) -> str:
+    """Převede text na malá písmena bez diakritiky ("Plzeň" -> "plzen")."""
+    normalized = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(ch for ch in normalized if not unicodedata.combining(ch)).strip()
+
+
+def _trigrams(text: str) -> set[str]:
+    padded = f"  {text} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+@dataclass
+class Municipality:
+    kod_obce: str
+    name: str
+    folded: str
+
+
+class MunicipalityIndex:
+    """Lokální index názvů obcí s prefixovým a fuzzy vyhledáváním.
+
+    Prefixy se hledají bisekcí nad seřazenými klíči (celý název a každý
+    jeho podřetězec od začátku slova), překlepy pokrývá trigramový index.
+    """
+
+    EXACT, PREFIX, WORD_PREFIX, CODE, FUZZY = range(5)
+
+    def __init__(self, municipalities: Iterable[tuple[str, str]]):
+        self._items: list[Municipality] = []
+        keys: list[tuple[str, int, int]] = []
+        self._grams: dict[str, list[int]] = defaultdict(list)
+        for idx, (kod_obce, name) in enumerate(municipalities):
+            folded = fold(name)
+            self._items.append(Municipality(kod_obce=str(kod_obce), name=name, folded=folded))
+            keys.append((folded, idx, self.PREFIX))
+            words = folded.replace("-", " ").split()
+            offset = 0
+            for word in words[1:]:
+                offset = folded.index(word, offset + 1)
+                keys.append((folded[offset:], idx, self.WORD_PREFIX))
+            for gram in _trigrams(folded):
+                self._grams[gram].append(idx)
+        keys.sort()
+        self._keys = [key for key, _, _ in keys]
+        self._key_refs = [(idx, rank) for _, idx, rank in keys]
+        self._codes = sorted((item.kod_obce, idx) for idx, item in enumerate(self._items))
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    @classmethod
+    def from_csv(cls, path: Path) -> "MunicipalityIndex":
+        with open(path, "r", encoding="utf-8") as fh:
+            reader = csv.DictReader(fh, delimiter=";")
+            rows = [
+                (row.get("KodObce") or row.get("Kod"), row.get("Nazev") or row.get("Název"))
+                for row in reader
+            ]
+        return cls((kod, name) for kod, name in rows if kod and name)
+
+    def search(self, query: str, limit: int = 10, fuzzy: bool = True) -> List[dict[str, str]]:
+        """Hledá podle kódu, přesného názvu a prefixu; s `fuzzy` i podle trigramů."""
+        q = fold(query)
+        if not q:
+            return []
+
+        best: dict[int, float] = {}
+
+        def offer(idx: int, rank: float) -> None:
+            if rank < best.get(idx, self.FUZZY + 1):
+                best[idx] = rank
+
+        if q.isdigit():
+            pos = bisect_left(self._codes, (q, -1))
+            while pos < len(self._codes) and self._codes[pos][0].startswith(q):
+                offer(self._codes[pos][1], self.CODE)
+                pos += 1
+        else:
+            pos = bisect_left(self._keys, q)
+            while pos < len(self._keys) and self._keys[pos].startswith(q):
+                idx, rank = self._key_refs[pos]
+                offer(idx, self.EXACT if self._items[idx].folded == q else rank)
+                pos += 1
+            if fuzzy and len(best) < limit:
+                for idx, score in self._fuzzy(q):
+                    if idx not in best:
+                        best[idx] = self.FUZZY + 1 - score
+
+        ranked = sorted(
+            best.items(),
+            key=lambda kv: (kv[1], len(self._items[kv[0]].name), self._items[kv[0]].folded),
+        )
+        return [
+            {"name": self._items[idx].name, "kod_obce": self._items[idx].kod_obce}
+            for idx, _ in ranked[:limit]
+        ]
+
+    def _fuzzy(self, q: str, threshold: float = 0.3) -> list[tuple[int, float]]:
+        grams = _trigrams(q)
+        counts: dict[int, int] = defaultdict(int)
+        for gram in grams:
+            for idx in self._grams.get(gram, ()):
+                counts[idx] += 1
+        matches = []
+        for idx, shared in counts.items():
+            item_grams = len(self._items[idx].folded) + 1
+            score = shared / (len(grams) + item_grams - shared)
+            if score >= threshold:
+                matches.append((idx, score))
+        return matches
+
+
+@lru_cache()
+def get_municipality_index() -> MunicipalityIndex:
+    settings = get_settings()
+    path = Path(settings.ruian_obce_path) if settings.ruian_obce_path else (
+        settings.project_root / "backend" / "data" / "obce.csv"
+    )
+    return MunicipalityIndex.from_csv(path)
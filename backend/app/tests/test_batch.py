@@ -0,0 +1,72 @@
+import asyncio
+import json
+
+from fastapi.testclient import TestClient
+
+from ..config import get_settings
+from ..database import get_connection, load_objects
+from ..main import app
+from ..metrics import STAGE_SECONDS
+from ..services import batch
+from ..services.batch import plan_batch, shutdown_process_pool
+
+
+def test_plan_batch_process_pool(tmp_path, monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "database_url", f"sqlite:///{tmp_path}/batch.db")
+    monkeypatch.setattr(settings, "batch_workers", 2)
+    monkeypatch.setattr(settings, "batch_write_size", 2)
+
+    classified = STAGE_SECONDS.count(stage="planner.classify")
+
+    async def collect():
+        with get_connection() as conn:
+            results = [result async for result, _ in plan_batch(conn, ["1", "2", "3", "2"])]
+            return results, load_objects(conn, "3")
+
+    try:
+        results, stored = asyncio.run(collect())
+        assert batch.get_process_pool()._mp_context.get_start_method() == "spawn"
+    finally:
+        shutdown_process_pool()
+
+    assert sorted(r["kod_obce"] for r in results) == ["1", "2", "3"]
+    assert all(r["status"] == "ok" and r["source"] == "ruian" for r in results)
+    assert len(stored) == results[0]["objects"]
+    assert STAGE_SECONDS.count(stage="planner.classify") == classified + 3
+
+
+def test_plan_batch_endpoint_geojson(tmp_path, monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "database_url", f"sqlite:///{tmp_path}/batch.db")
+    monkeypatch.setattr(settings, "batch_workers", 0)
+
+    client = TestClient(app)
+    first = client.post("/api/plan/batch", json={"kod_obce": ["1", "2"]})
+    lines = [json.loads(line) for line in first.text.splitlines()]
+    assert {line["kod_obce"] for line in lines} == {"1", "2"}
+
+    combined = client.post("/api/plan/batch", json={"kod_obce": ["1", "2"], "format": "geojson"})
+    payload = combined.json()
+    assert payload["type"] == "FeatureCollection"
+    assert len(payload["features"]) == sum(line["objects"] for line in lines)
+
+
+def test_plan_batch_write_error_reported(tmp_path, monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "database_url", f"sqlite:///{tmp_path}/batch.db")
+    monkeypatch.setattr(settings, "batch_workers", 0)
+    monkeypatch.setattr(settings, "batch_write_size", 1)
+
+    def failing_write(conn, batch):
+        if any(kod == "2" for kod, _, _ in batch):
+            raise RuntimeError("disk full")
+        return original_write(conn, batch)
+
+    original_write = batch._write_batch
+    monkeypatch.setattr(batch, "_write_batch", failing_write)
+
+    response = TestClient(app).post("/api/plan/batch", json={"kod_obce": ["1", "2", "3"]})
+    lines = {line["kod_obce"]: line for line in map(json.loads, response.text.splitlines())}
+    assert lines["2"] == {"kod_obce": "2", "status": "error", "detail": "disk full"}
+    assert lines["1"]["status"] == lines["3"]["status"] == "ok"
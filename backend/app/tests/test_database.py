@@ -0,0 +1,78 @@
+import sqlite3
+
+import pytest
+
+from ..config import get_settings
+from ..database import (
+    _ensure_schema,
+    get_connection,
+    iter_objects,
+    load_objects,
+    query_objects,
+    replace_objects,
+)
+from ..models import ObjectRecord
+
+
+def make_conn(count: int = 5) -> sqlite3.Connection:
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    _ensure_schema(conn)
+    objects = [
+        ObjectRecord(
+            kod_obce="1",
+            kod_stavebni_objekt=str(i),
+            typ="BD" if i % 2 else "RD",
+            byty_odhad=1,
+            letaky=1,
+            lon=None if i == 0 else 15.0 + i,
+            lat=None if i == 0 else 49.0,
+            ulice="Test",
+            cp_ce=str(i),
+            cast_obce="Sever" if i < 3 else "Jih",
+            psc="10000",
+        )
+        for i in range(count)
+    ]
+    replace_objects(conn, "1", objects)
+    return conn
+
+
+def test_query_objects_projection():
+    rows = list(query_objects(make_conn(), "1", fields=["lon", "lat"]))
+    assert rows[0].keys() == ["id", "lon", "lat"]
+
+
+def test_query_objects_rejects_unknown_field():
+    with pytest.raises(ValueError):
+        list(query_objects(make_conn(), "1", fields=["id; DROP TABLE objects"]))
+
+
+def test_query_objects_filters():
+    conn = make_conn()
+    assert len(list(query_objects(conn, "1", has_coordinates=True))) == 4
+    assert len(list(query_objects(conn, "1", typ="BD"))) == 2
+    assert [o.cp_ce for o in iter_objects(conn, "1", cast_obce="Jih")] == ["3", "4"]
+
+
+def test_query_objects_keyset_pages():
+    conn = make_conn(7)
+    seen = []
+    after = None
+    while True:
+        page = [row["id"] for row in query_objects(conn, "1", fields=["id"], after_id=after, limit=3)]
+        if not page:
+            break
+        seen.extend(page)
+        after = page[-1]
+    assert seen == sorted(seen) and len(seen) == 7
+
+
+def test_get_connection_recreates_removed_database(tmp_path, monkeypatch):
+    db_path = tmp_path / "rotated.db"
+    monkeypatch.setattr(get_settings(), "database_url", f"sqlite:///{db_path}")
+    with get_connection() as conn:
+        assert load_objects(conn, "1") == []
+    db_path.unlink()
+    with get_connection() as conn:
+        assert load_objects(conn, "1") == []
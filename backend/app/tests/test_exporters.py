@@ -1,5 +1,13 @@
+import io
+import zipfile
+
+from fastapi.testclient import TestClient
+
+from ..config import get_settings
+from ..main import app
+from ..metrics import CACHE_REQUESTS
 from ..models import ObjectRecord
-from ..services.exporters import export_csv, export_geojson, export_kml, export_gpx
+from ..services.exporters import export_bundle, export_csv, export_geojson, export_kml, export_gpx
 
 
 def sample_object() -> ObjectRecord:
@@ -39,3 +47,50 @@ def test_export_kml():
 def test_export_gpx():
     gpx = export_gpx([sample_object()])
     assert "<gpx" in gpx
+
+
+def test_export_bundle():
+    buffer = io.BytesIO()
+    assert export_bundle(iter([sample_object(), sample_object()]), buffer) == 2
+    with zipfile.ZipFile(buffer) as archive:
+        assert sorted(archive.namelist()) == ["plan.csv", "plan.geojson", "plan.gpx", "plan.kml"]
+        assert archive.read("plan.csv").decode("utf-8").count("\n") == 3
+
+
+def test_export_bundle_endpoint_cached(tmp_path, monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "database_url", f"sqlite:///{tmp_path}/bundle.db")
+    monkeypatch.setattr(settings, "export_cache_dir", str(tmp_path / "exports"))
+    monkeypatch.setattr(settings, "batch_workers", 0)
+
+    client = TestClient(app)
+    assert client.get("/api/export.zip", params={"kod_obce": "1"}).status_code == 404
+    client.post("/api/plan/batch", json={"kod_obce": ["1"]})
+
+    hits = CACHE_REQUESTS.value(cache="export_bundle", result="hit")
+    first = client.get("/api/export.zip", params={"kod_obce": "1"})
+    assert first.status_code == 200
+    with zipfile.ZipFile(io.BytesIO(first.content)) as archive:
+        assert len(archive.namelist()) == 4
+
+    second = client.get("/api/export.zip", params={"kod_obce": "1"}, headers={"Range": "bytes=0-9"})
+    assert second.status_code == 206
+    assert second.content == first.content[:10]
+    assert CACHE_REQUESTS.value(cache="export_bundle", result="hit") == hits + 1
+    assert len(list((tmp_path / "exports").glob("*.zip"))) == 1
+
+
+def test_export_bundle_path_stays_in_cache_dir(tmp_path, monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "database_url", f"sqlite:///{tmp_path}/bundle.db")
+    monkeypatch.setattr(settings, "export_cache_dir", str(tmp_path / "exports"))
+    outside = tmp_path / "escaped-keep.zip"
+    outside.write_bytes(b"keep")
+
+    client = TestClient(app)
+    client.post("/api/plan", json={"kod_obce": "../escaped"})
+    assert client.get("/api/export.zip", params={"kod_obce": "../escaped"}).status_code == 200
+
+    assert outside.read_bytes() == b"keep"
+    assert list(tmp_path.glob("escaped-*.zip")) == [outside]
+    assert len(list((tmp_path / "exports").glob("*.zip"))) == 1
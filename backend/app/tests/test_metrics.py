@@ -0,0 +1,45 @@
+from fastapi.testclient import TestClient
+
+from ..config import get_settings
+from ..main import app
+from ..metrics import Histogram, STAGE_SECONDS, timed
+
+
+def test_histogram_render_cumulative_buckets():
+    histogram = Histogram("demo_seconds", "Demo", ("stage",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, stage="a")
+    histogram.observe(0.5, stage="a")
+    histogram.observe(5.0, stage="a")
+    lines = histogram.render()
+    assert 'demo_seconds_bucket{stage="a",le="0.1"} 1.0' in lines
+    assert 'demo_seconds_bucket{stage="a",le="1.0"} 2.0' in lines
+    assert 'demo_seconds_bucket{stage="a",le="+Inf"} 3.0' in lines
+    assert 'demo_seconds_count{stage="a"} 3.0' in lines
+
+
+def test_timed_decorator_records_each_call():
+    @timed("test.stage")
+    def work():
+        return 1
+
+    before = STAGE_SECONDS.count(stage="test.stage")
+    work()
+    work()
+    assert STAGE_SECONDS.count(stage="test.stage") == before + 2
+
+
+def test_metrics_endpoint_reports_request_latency():
+    client = TestClient(app)
+    client.get("/api/status")
+    body = client.get("/metrics").text
+    assert 'http_request_duration_seconds_count{method="GET",path="/api/status",status="200"}' in body
+    assert "# TYPE stage_duration_seconds histogram" in body
+
+
+def test_startup_time_recorded(tmp_path, monkeypatch):
+    monkeypatch.setattr(get_settings(), "database_url", f"sqlite:///{tmp_path}/startup.db")
+    with TestClient(app) as client:
+        body = client.get("/metrics").text
+    assert 'app_startup_seconds{phase="import"}' in body
+    assert 'app_startup_seconds{phase="ready"}' in body
+    assert (tmp_path / "startup.db").exists()
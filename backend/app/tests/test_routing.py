@@ -1,4 +1,10 @@
-from ..services.routing import build_route
+import math
+
+import pytest
+from pydantic import ValidationError
+
+from ..schemas import RouteRequest
+from ..services.routing import build_route, compact_stops, encode_polyline, simplify_line
 
 
 def test_greedy_route_order():
@@ -10,3 +16,131 @@ def test_greedy_route_order():
     route = build_route(points, engine="none", profile="foot")
     assert route["properties"]["order"][0] == "a"
     assert len(route["geometry"]["coordinates"]) == 3
+
+
+def street(count: int, typ: str = "RD", letaky: int = 1, step: float = 0.0005):
+    return [
+        {"id": str(i), "lon": 15.0 + i * step, "lat": 49.0, "letaky": letaky, "typ": typ}
+        for i in range(count)
+    ]
+
+
+def test_tours_split_by_capacity():
+    route = build_route(street(10, letaky=3), engine="none", profile="foot", max_letaky=10)
+    segments = route["properties"]["segments"]
+    assert [len(s["order"]) for s in segments] == [3, 3, 3, 1]
+    assert all(s["letaky"] <= 10 for s in segments)
+    assert route["properties"]["order"] == [str(i) for i in range(10)]
+    assert len(route["properties"]["refill_points"]) == 4
+
+
+def test_tours_service_time_depends_on_type():
+    rd = build_route(street(3, "RD", 1), engine="none", profile="foot", max_shift_s=10_000)
+    bd = build_route(street(3, "BD", 20), engine="none", profile="foot", max_shift_s=10_000)
+    assert bd["properties"]["service_s"] > rd["properties"]["service_s"]
+    assert rd["properties"]["duration_s"] > rd["properties"]["distance_m"] / 1.4
+
+
+def test_tours_return_to_depot_within_shift():
+    depot = {"lon": 15.0, "lat": 49.0}
+    points = street(40, step=0.0001)
+    route = build_route(points, engine="none", profile="foot", max_shift_s=900, depot=depot)
+    segments = route["properties"]["segments"]
+    assert len(segments) > 1
+    assert all(s["duration_s"] <= 900 for s in segments)
+    for line in route["geometry"]["coordinates"]:
+        assert line[0] == line[-1] == [15.0, 49.0]
+    assert sorted(route["properties"]["order"], key=int) == [str(i) for i in range(40)]
+
+
+def test_compact_stops_by_building_and_epsilon():
+    points = [
+        {"id": "a1", "lon": 15.0, "lat": 49.0, "kod_stavebni_objekt": "10", "typ": "BD"},
+        {"id": "a2", "lon": 15.0, "lat": 49.0, "kod_stavebni_objekt": "10", "typ": "BD"},
+        {"id": "b", "lon": 15.001, "lat": 49.0},
+        {"id": "b2", "lon": 15.00100001, "lat": 49.0},
+    ]
+    stops, members = compact_stops(points)
+    assert len(stops) == 2
+    assert stops[0]["letaky"] == 2
+    assert members == {"a1": ["a1", "a2"], "b": ["b", "b2"]}
+
+
+def test_compacted_route_expands_to_all_ids():
+    points = [
+        {
+            "id": f"{building}-{flat}",
+            "lon": 15.0 + building * 0.001,
+            "lat": 49.0,
+            "kod_stavebni_objekt": str(building),
+        }
+        for building in range(5)
+        for flat in range(4)
+    ]
+    route = build_route(points, engine="none", profile="foot", compact=True)
+    assert route["properties"]["stops"] == 5
+    assert len(route["geometry"]["coordinates"]) == 5
+    assert sorted(route["properties"]["order"]) == sorted(p["id"] for p in points)
+    assert route["properties"]["order"][:4] == ["0-0", "0-1", "0-2", "0-3"]
+
+
+def test_hilbert_route_visits_all_points():
+    points = [
+        {"id": f"{x}-{y}", "lon": 15.0 + x * 0.001, "lat": 49.0 + y * 0.001}
+        for x in range(8)
+        for y in range(8)
+    ]
+    route = build_route(points, engine="hilbert", profile="foot")
+    assert sorted(route["properties"]["order"]) == sorted(p["id"] for p in points)
+    # Hilbertova křivka nad mřížkou prochází jen sousední body
+    assert route["properties"]["distance_m"] < 64 * 120
+
+
+def test_hilbert_improvement_does_not_lengthen_route():
+    points = [
+        {"id": str(i), "lon": 15.0 + (i * 7 % 13) * 0.001, "lat": 49.0 + (i * 5 % 11) * 0.001}
+        for i in range(60)
+    ]
+    plain = build_route(points, engine="hilbert", profile="foot")
+    improved = build_route(points, engine="hilbert", profile="foot", improve_passes=3)
+    assert improved["properties"]["distance_m"] <= plain["properties"]["distance_m"]
+
+
+def test_encode_polyline_reference():
+    coordinates = [[-120.2, 38.5], [-120.95, 40.7], [-126.453, 43.252]]
+    assert encode_polyline(coordinates) == "_p~iF~ps|U_ulLnnqC_mqNvxq`@"
+
+
+def test_simplify_line_drops_collinear_points():
+    line = [[15.0 + i * 0.0001, 49.0] for i in range(50)] + [[15.005, 49.001]]
+    simplified = simplify_line(line, tolerance_m=1.0)
+    assert simplified == [line[0], line[-2], line[-1]]
+
+
+def test_route_reports_geometry_point_counts():
+    points = [{"id": str(i), "lon": 15.0 + i * 0.0001, "lat": 49.0} for i in range(30)]
+    route = build_route(points, engine="none", profile="foot", zoom=14, geometry_format="polyline")
+    assert route["properties"]["geometry_points_before"] == 30
+    assert route["properties"]["geometry_points_after"] == 2
+    assert route["geometry"] is None
+    assert isinstance(route["properties"]["polyline"], str)
+
+
+def test_tours_reject_other_engines():
+    features = [{"id": "a", "lon": 15.0, "lat": 49.0}]
+    assert RouteRequest(features=features, engine="none", max_letaky=10).max_letaky == 10
+    with pytest.raises(ValidationError):
+        RouteRequest(features=features, engine="osrm", max_letaky=10)
+
+
+def test_compact_stops_uses_distance_not_cell():
+    kx = 111_320.0 * math.cos(math.radians(49.0))
+    boundary = round(15.0 * kx / 5.0) * 5.0 / kx
+    metre = 1 / kx
+    points = [
+        {"id": "left", "lon": boundary - 0.1 * metre, "lat": 49.0},
+        {"id": "right", "lon": boundary + 0.1 * metre, "lat": 49.0},
+        {"id": "far", "lon": boundary + 5.0 * metre, "lat": 49.0 + 5.0 / 110_540.0},
+    ]
+    stops, members = compact_stops(points)
+    assert members == {"left": ["left", "right"], "far": ["far"]}
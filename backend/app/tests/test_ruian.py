@@ -0,0 +1,114 @@
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+from fastapi.testclient import TestClient
+
+from .. import http_client, ruian
+from ..config import get_settings
+from ..main import app
+
+
+class SlowHandler(BaseHTTPRequestHandler):
+    delay = 0.5
+    body = b'{"results": [{"name": "Lhota", "kod_obce": "999999"}]}'
+    paths: list[str] = []
+
+    def do_GET(self):
+        self.paths.append(self.path)
+        time.sleep(self.delay)
+        body = self.body
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class BrnenecHandler(SlowHandler):
+    delay = 0
+    body = '{"results": [{"name": "Brněnec", "kod_obce": "577928"}]}'.encode("utf-8")
+    paths: list[str] = []
+
+
+def _search_with_stub(monkeypatch, queries: list[str]) -> list[list[dict[str, str]]]:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), BrnenecHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(get_settings(), "ruian_source_url", f"http://127.0.0.1:{server.server_port}")
+    monkeypatch.setattr(ruian, "_search_cache", ruian.OrderedDict())
+    monkeypatch.setattr(BrnenecHandler, "paths", [])
+
+    async def scenario():
+        return [await ruian.search_municipality(q) for q in queries]
+
+    try:
+        return asyncio.run(scenario())
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_fuzzy_local_hit_still_queries_remote(monkeypatch):
+    (fuzzy,) = _search_with_stub(monkeypatch, ["Brnenec"])
+    assert fuzzy[0] == {"name": "Brněnec", "kod_obce": "577928"}
+    assert "Brno" in [item["name"] for item in fuzzy]
+    assert len(BrnenecHandler.paths) == 1
+
+
+def test_prefix_local_hit_still_queries_remote(monkeypatch):
+    prefix, repeated = _search_with_stub(monkeypatch, ["Brn", "brn"])
+    assert [item["name"] for item in prefix] == ["Brno", "Brněnec"]
+    assert repeated == prefix
+    assert len(BrnenecHandler.paths) == 1
+
+
+def test_slow_ruian_does_not_block_other_endpoints(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SlowHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(get_settings(), "ruian_source_url", f"http://127.0.0.1:{server.server_port}")
+    monkeypatch.setattr(ruian, "_search_cache", ruian.OrderedDict())
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            started = time.perf_counter()
+            slow = asyncio.create_task(client.post("/api/search-municipality", json={"q": "Lhota"}))
+            await asyncio.sleep(0.05)
+            latencies = []
+            for _ in range(5):
+                t0 = time.perf_counter()
+                response = await client.get("/api/status")
+                latencies.append(time.perf_counter() - t0)
+                assert response.status_code == 200
+            result = await slow
+            slow_elapsed = time.perf_counter() - started
+        await http_client.close_client()
+        return result, slow_elapsed, latencies
+
+    try:
+        result, slow_elapsed, latencies = asyncio.run(scenario())
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert result.json() == [{"name": "Lhota", "kod_obce": "999999"}]
+    assert slow_elapsed >= SlowHandler.delay
+    assert max(latencies) < SlowHandler.delay / 2
+
+
+def test_shared_client_bound_to_lifespan(monkeypatch, tmp_path):
+    _search_with_stub(monkeypatch, ["Brnenec"])
+    _search_with_stub(monkeypatch, ["Brnenec"])
+    assert http_client._client is None
+
+    monkeypatch.setattr(get_settings(), "database_url", f"sqlite:///{tmp_path}/client.db")
+    with TestClient(app):
+        assert http_client._client is not None
+    assert http_client._client is None
@@ -0,0 +1,42 @@
+from ..services.search import MunicipalityIndex, fold
+
+
+def make_index() -> MunicipalityIndex:
+    return MunicipalityIndex(
+        [
+            ("554791", "Plzeň"),
+            ("586846", "Jihlava"),
+            ("598003", "Frýdek-Místek"),
+            ("554804", "Ústí nad Labem"),
+            ("599999", "Jihlávka"),
+        ]
+    )
+
+
+def test_fold_strips_diacritics():
+    assert fold("Ústí nad Labem") == "usti nad labem"
+
+
+def test_search_prefix_without_diacritics():
+    results = make_index().search("plz")
+    assert results == [{"name": "Plzeň", "kod_obce": "554791"}]
+
+
+def test_search_ranks_exact_before_prefix():
+    results = make_index().search("jihlava")
+    assert [item["name"] for item in results][:2] == ["Jihlava", "Jihlávka"]
+
+
+def test_search_word_prefix():
+    results = make_index().search("mistek")
+    assert results[0]["kod_obce"] == "598003"
+
+
+def test_search_fuzzy_typo():
+    results = make_index().search("jihlvaa")
+    assert results[0]["name"] == "Jihlava"
+
+
+def test_search_by_code():
+    results = make_index().search("5548")
+    assert [item["kod_obce"] for item in results] == ["554804"]
@@ -0,0 +1,292 @@
+from __future__ import annotations
+
+import argparse
+import io
+import gc
+import json
+import platform
+import sqlite3
+import subprocess
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable
+
+from app.database import _ensure_schema, load_objects, replace_objects
+from app.ruian import coalesce_record, parse_csv, records_from_dicts
+from app.services.exporters import export_bundle, export_csv, export_geojson, export_gpx, export_kml
+from app.services.planner import PlannerService
+from app.services.routing import build_route, greedy_route, hilbert_route, plan_tours
+
+from .synthetic import synthetic_csv_lines, synthetic_points
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+GREEDY_MAX_SIZE = 2_000
+
+
+@dataclass
+class Case:
+    """Jeden měřený krok: `setup` připraví vstup mimo měření, `run` se měří.
+
+    Volitelný `report(vstup, výsledek)` doplní metriky (např. délku trasy).
+    """
+
+    name: str
+    setup: Callable[[int], Any]
+    run: Callable[[Any], Any]
+    report: Callable[[Any, Any], dict] | None = None
+    max_size: int | None = None
+
+
+class _Fixture:
+    """Sdílená data pro jednu velikost, aby se generovala jen jednou."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.lines = synthetic_csv_lines(size)
+        self.rows = list(parse_csv(self.lines))
+        self.records = records_from_dicts(self.rows)
+        self.objects = PlannerService.classify(self.records, "999999")
+
+
+_fixtures: dict[int, _Fixture] = {}
+
+
+def fixture(size: int) -> _Fixture:
+    if size not in _fixtures:
+        _fixtures.clear()
+        _fixtures[size] = _Fixture(size)
+    return _fixtures[size]
+
+
+def _memory_db(objects=None) -> sqlite3.Connection:
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    _ensure_schema(conn)
+    if objects is not None:
+        replace_objects(conn, "999999", objects)
+    return conn
+
+
+def _object_points(size: int) -> list[dict]:
+    """Body trasy z klasifikovaných objektů (bytové domy mají více bodů na stejném místě)."""
+    return [
+        {
+            "id": str(i),
+            "lon": obj.lon,
+            "lat": obj.lat,
+            "kod_stavebni_objekt": obj.kod_stavebni_objekt,
+            "letaky": obj.letaky,
+            "typ": obj.typ,
+        }
+        for i, obj in enumerate(fixture(size).objects)
+    ]
+
+
+def _route_report(points: list[dict], route: dict) -> dict:
+    return {"distance_m": round(route["properties"]["distance_m"], 1)}
+
+
+_greedy_distance: dict[int, float] = {}
+
+
+def _quality_report(points: list[dict], route: dict) -> dict:
+    """Délka trasy a poměr k greedy_route nad stejnými body (greedy jen do GREEDY_MAX_SIZE)."""
+    report = _route_report(points, route)
+    if len(points) <= GREEDY_MAX_SIZE:
+        if len(points) not in _greedy_distance:
+            _greedy_distance[len(points)] = greedy_route(points)["properties"]["distance_m"]
+        greedy = _greedy_distance[len(points)]
+        report["vs_greedy"] = round(route["properties"]["distance_m"] / greedy, 3) if greedy else None
+    return report
+
+
+CASES: list[Case] = [
+    Case("parse_csv", lambda n: fixture(n).lines, lambda lines: list(parse_csv(lines))),
+    Case("coalesce_record", lambda n: fixture(n).rows, lambda rows: [coalesce_record(r) for r in rows]),
+    Case(
+        "planner.classify",
+        lambda n: fixture(n).records,
+        lambda records: PlannerService.classify(records, "999999"),
+    ),
+    Case(
+        "database.replace_objects",
+        lambda n: (_memory_db(), fixture(n).objects),
+        lambda state: replace_objects(state[0], "999999", state[1]),
+    ),
+    Case(
+        "database.load_objects",
+        lambda n: _memory_db(fixture(n).objects),
+        lambda conn: load_objects(conn, "999999"),
+    ),
+    Case("export_csv", lambda n: fixture(n).objects, export_csv),
+    Case("export_geojson", lambda n: fixture(n).objects, export_geojson),
+    Case("export_kml", lambda n: fixture(n).objects, export_kml),
+    Case("export_gpx", lambda n: fixture(n).objects, export_gpx),
+    Case("export_bundle", lambda n: fixture(n).objects, lambda objects: export_bundle(objects, io.BytesIO())),
+    Case("planner.to_geojson", lambda n: fixture(n).objects, PlannerService.to_geojson),
+    Case(
+        "routing.greedy_route",
+        synthetic_points,
+        greedy_route,
+        report=_route_report,
+        max_size=GREEDY_MAX_SIZE,
+    ),
+    Case("routing.hilbert", synthetic_points, hilbert_route, report=_quality_report),
+    Case(
+        "routing.hilbert_2opt",
+        synthetic_points,
+        lambda points: hilbert_route(points, improve_passes=2),
+        report=_quality_report,
+    ),
+    Case(
+        "routing.objects.greedy",
+        _object_points,
+        lambda points: build_route(points, "none", "foot"),
+        report=_route_report,
+        max_size=GREEDY_MAX_SIZE,
+    ),
+    Case(
+        "routing.objects.compact_greedy",
+        _object_points,
+        lambda points: build_route(points, "none", "foot", compact=True),
+        report=_route_report,
+        max_size=GREEDY_MAX_SIZE,
+    ),
+    Case(
+        "routing.plan_tours",
+        synthetic_points,
+        lambda points: plan_tours(points, max_letaky=300, max_shift_s=4 * 3600),
+        report=_route_report,
+        max_size=100_000,
+    ),
+]
+
+
+def _measure(case: Case, size: int, memory: bool, repeat: int) -> dict:
+    seconds = float("inf")
+    for _ in range(max(repeat, 1)):
+        state = case.setup(size)
+        gc.collect()
+        started = time.perf_counter()
+        output = case.run(state)
+        seconds = min(seconds, time.perf_counter() - started)
+
+    peak = None
+    if memory:
+        state = case.setup(size)
+        gc.collect()
+        tracemalloc.start()
+        output = case.run(state)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    result = {
+        "name": case.name,
+        "size": size,
+        "seconds": round(seconds, 6),
+        "throughput_per_s": round(size / seconds, 1) if seconds else None,
+        "peak_bytes": peak,
+    }
+    if case.report is not None:
+        result.update(case.report(state, output))
+    return result
+
+
+def _git_commit() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip()
+
+
+def run_benchmarks(
+    sizes: list[int], only: list[str] | None = None, memory: bool = True, repeat: int = 3
+) -> dict:
+    results = []
+    for size in sizes:
+        for case in CASES:
+            if only and not any(name in case.name for name in only):
+                continue
+            if case.max_size is not None and size > case.max_size:
+                continue
+            result = _measure(case, size, memory, repeat)
+            print(
+                f"{case.name:<32} {size:>9} {result['seconds']:>10.4f} s"
+                f" {result['throughput_per_s'] or 0:>14.0f} /s",
+                file=sys.stderr,
+            )
+            results.append(result)
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "created_at": datetime.utcnow().isoformat(),
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def compare(baseline_path: Path, current_path: Path, threshold: float) -> int:
+    """Porovná dva běhy; vrací 1, pokud je některý krok pomalejší o víc než `threshold`."""
+    baseline = {(r["name"], r["size"]): r for r in json.loads(baseline_path.read_text())["results"]}
+    current = json.loads(current_path.read_text())["results"]
+    regressions = 0
+    for result in current:
+        before = baseline.get((result["name"], result["size"]))
+        if not before or not before["seconds"]:
+            continue
+        ratio = result["seconds"] / before["seconds"]
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(
+            f"{result['name']:<32} {result['size']:>9} {before['seconds']:>10.4f} ->"
+            f" {result['seconds']:>10.4f} s ({ratio:.2f}x){flag}"
+        )
+    return 1 if regressions else 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarky importu, klasifikace, exportu a trasování")
+    sub = parser.add_subparsers(dest="command")
+
+    run_parser = sub.add_parser("run", help="spustí benchmarky")
+    run_parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    run_parser.add_argument("--repeat", type=int, default=3, help="počet opakování, bere se nejlepší čas")
+    run_parser.add_argument("--only", nargs="+", help="jen kroky obsahující daný text")
+    run_parser.add_argument("--no-memory", action="store_true", help="neměřit špičku paměti")
+    run_parser.add_argument("--output", type=Path, help="soubor pro JSON výsledky")
+
+    compare_parser = sub.add_parser("compare", help="porovná dva JSON výsledky")
+    compare_parser.add_argument("baseline", type=Path)
+    compare_parser.add_argument("current", type=Path)
+    compare_parser.add_argument("--threshold", type=float, default=0.1)
+
+    args = parser.parse_args(argv)
+    if args.command == "compare":
+        return compare(args.baseline, args.current, args.threshold)
+    if args.command != "run":
+        parser.print_help()
+        return 2
+
+    report = run_benchmarks(args.sizes, args.only, memory=not args.no_memory, repeat=args.repeat)
+    payload = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        args.output.write_text(payload, encoding="utf-8")
+    else:
+        print(payload)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
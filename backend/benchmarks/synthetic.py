@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import random
+from typing import Iterator
+
+HEADER = [
+    "KodStavebniObjekt",
+    "TypBudovy",
+    "Longitude",
+    "Latitude",
+    "CisloDomovni",
+    "Ulice",
+    "CastObce",
+    "Obec",
+    "PSC",
+]
+
+STREETS = ["Lipová", "Husova", "Masarykova", "Nádražní", "Školní", "Polní", "Zahradní", "Krátká"]
+PARTS = ["Střed", "Sever", "Jih", "Horní", "Dolní"]
+
+
+def synthetic_rows(count: int, seed: int = 42) -> Iterator[dict[str, str]]:
+    """Vrací `count` adresních míst ve formátu RÚIAN CSV.
+
+    Zhruba 80 % staveb jsou rodinné domy s jedním adresním místem, zbytek
+    bytové domy se 2–40 záznamy se stejnými souřadnicemi.
+    """
+    rng = random.Random(seed)
+    produced = 0
+    building = 100000
+    while produced < count:
+        building += 1
+        bytovy = rng.random() < 0.2
+        entries = rng.randint(2, 40) if bytovy else 1
+        lon = 15.5 + rng.random() * 0.1
+        lat = 49.35 + rng.random() * 0.1
+        street = rng.choice(STREETS)
+        for _ in range(min(entries, count - produced)):
+            produced += 1
+            yield {
+                "KodStavebniObjekt": str(building),
+                "TypBudovy": "Bytový dům" if bytovy else "Rodinný dům",
+                "Longitude": f"{lon:.6f}",
+                "Latitude": f"{lat:.6f}",
+                "CisloDomovni": str(building % 1000),
+                "Ulice": street,
+                "CastObce": rng.choice(PARTS),
+                "Obec": "Benchmark",
+                "PSC": "58601",
+            }
+
+
+def synthetic_csv_lines(count: int, seed: int = 42) -> list[str]:
+    lines = [";".join(HEADER)]
+    for row in synthetic_rows(count, seed):
+        lines.append(";".join(row[column] for column in HEADER))
+    return lines
+
+
+def synthetic_points(count: int, seed: int = 42) -> list[dict]:
+    rng = random.Random(seed)
+    points = []
+    for i in range(count):
+        bytovy = rng.random() < 0.2
+        points.append(
+            {
+                "id": str(i),
+                "lon": 15.5 + rng.random() * 0.1,
+                "lat": 49.35 + rng.random() * 0.1,
+                "typ": "BD" if bytovy else "RD",
+                "letaky": rng.randint(2, 40) if bytovy else 1,
+            }
+        )
+    return points